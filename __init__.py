@@ -1,7 +1,14 @@
 from .nodes.hf.hf_download import HFDownloader
 from .nodes.auto.downloader import AutoModelDownloader
 from .nodes.cai.cai_download import CivitAIDownloader
-from .nodes.download_utils import DownloadManager
+from .nodes.bulk.bulk_download import BulkDownloader, bulk_runs, parse_manifest
+from .nodes.download_utils import DownloadManager, download_scheduler
+from .nodes.download_metrics import download_metrics
+from .nodes.base_downloader import cache_manager, download_manifest, get_base_dir
+from .nodes.cache_manager import parse_size
+from .nodes.auto.search_cache import search_cache
+from .nodes.auto.prefetch import workflow_prefetcher
+from .nodes.async_engine import set_event_loop
 from server import PromptServer
 from aiohttp import web
 import os
@@ -28,6 +35,7 @@ NODE_CLASS_MAPPINGS = {
     "HF Downloader": HFDownloader,
     "Auto Model Downloader": AutoModelDownloader,
     "CivitAI Downloader": CivitAIDownloader,
+    "Bulk Downloader": BulkDownloader,
 }
 
 # Display names
@@ -35,8 +43,18 @@ NODE_DISPLAY_NAME_MAPPINGS = {
     "HF Downloader": "HF Download",
     "Auto Model Downloader": "Auto Model Finder (Experimental)",
     "CivitAI Downloader": "CivitAI Download",
+    "Bulk Downloader": "Bulk Download (Manifest)",
 }
 
+# Async downloads share ComfyUI's server event loop
+set_event_loop(PromptServer.instance.loop)
+
+# Start fetching a workflow's models as soon as it is queued (off unless enabled)
+PromptServer.instance.add_on_prompt_handler(workflow_prefetcher.on_prompt)
+
+# Models a queued workflow uses count as recently used for cache eviction
+PromptServer.instance.add_on_prompt_handler(cache_manager.on_prompt)
+
 # Web directory for JavaScript files
 WEB_DIRECTORY = "./js"
 
@@ -59,7 +77,8 @@ async def cancel_download_route(request):
         print(f"Received node_id: {node_id_str} (original: {node_id}, type: {type(node_id)})")
         print(f"Active downloads: {list(DownloadManager.active_downloads.keys())}")
         
-        if DownloadManager.cancel_download(node_id_str):
+        # A bulk node cancels every file it is downloading
+        if bulk_runs.cancel(node_id_str) or DownloadManager.cancel_download(node_id_str):
             print(f"Successfully cancelled download for node {node_id_str}")
             return web.json_response({"status": "cancelled"})
         else:
@@ -72,6 +91,225 @@ async def cancel_download_route(request):
         traceback.print_exc()
         return web.json_response({"status": "error", "error": str(e)}, status=500)
 
+@PromptServer.instance.routes.get("/model_downloader/jobs")
+async def list_download_jobs_route(request):
+    return web.json_response({
+        "max_concurrent": download_scheduler.max_concurrent,
+        "max_connections_per_host": download_scheduler.max_connections_per_host,
+        "engine": DownloadManager.engine,
+        "jobs": download_scheduler.jobs(),
+    })
+
+@PromptServer.instance.routes.post("/model_downloader/scheduler")
+async def configure_scheduler_route(request):
+    try:
+        json_data = await request.json()
+        download_scheduler.configure(
+            max_concurrent=json_data.get("max_concurrent"),
+            max_connections_per_host=json_data.get("max_connections_per_host"),
+            engine=json_data.get("engine"),
+        )
+        return web.json_response({
+            "status": "ok",
+            "max_concurrent": download_scheduler.max_concurrent,
+            "max_connections_per_host": download_scheduler.max_connections_per_host,
+            "engine": DownloadManager.engine,
+        })
+    except (ValueError, TypeError) as e:
+        return web.json_response({"status": "bad_request", "error": str(e)}, status=400)
+
+@PromptServer.instance.routes.get("/model_downloader/bandwidth")
+async def get_bandwidth_route(request):
+    return web.json_response(DownloadManager.limiter.limits())
+
+@PromptServer.instance.routes.post("/model_downloader/bandwidth")
+async def set_bandwidth_route(request):
+    try:
+        json_data = await request.json()
+        DownloadManager.limiter.configure(
+            global_limit=json_data.get("global_limit"),
+            per_host_limit=json_data.get("per_host_limit"),
+            per_download_limit=json_data.get("per_download_limit"),
+        )
+        return web.json_response({"status": "ok", **DownloadManager.limiter.limits()})
+    except (ValueError, TypeError) as e:
+        return web.json_response({"status": "bad_request", "error": str(e)}, status=400)
+
+def _retry_settings():
+    return {
+        **DownloadManager.retry_policy.settings(),
+        "connect_timeout": DownloadManager.connect_timeout,
+        "read_timeout": DownloadManager.read_timeout,
+        "stall_min_speed": DownloadManager.stall_watchdog.min_speed,
+        "stall_timeout": DownloadManager.stall_watchdog.timeout,
+        "open_circuits": DownloadManager.circuit_breaker.state(),
+    }
+
+@PromptServer.instance.routes.get("/model_downloader/retry")
+async def get_retry_route(request):
+    return web.json_response(_retry_settings())
+
+@PromptServer.instance.routes.post("/model_downloader/retry")
+async def set_retry_route(request):
+    try:
+        json_data = await request.json()
+        DownloadManager.retry_policy.configure(
+            max_attempts=json_data.get("max_attempts"),
+            base_delay=json_data.get("base_delay"),
+            max_delay=json_data.get("max_delay"),
+        )
+        if json_data.get("connect_timeout") is not None:
+            DownloadManager.connect_timeout = max(1.0, float(json_data["connect_timeout"]))
+        if json_data.get("read_timeout") is not None:
+            DownloadManager.read_timeout = max(1.0, float(json_data["read_timeout"]))
+        if json_data.get("stall_min_speed") is not None:
+            DownloadManager.stall_watchdog.min_speed = max(0, int(json_data["stall_min_speed"]))
+        if json_data.get("stall_timeout") is not None:
+            DownloadManager.stall_watchdog.timeout = max(0.0, float(json_data["stall_timeout"]))
+        return web.json_response({"status": "ok", **_retry_settings()})
+    except (ValueError, TypeError) as e:
+        return web.json_response({"status": "bad_request", "error": str(e)}, status=400)
+
+def _cache_dir(local_path):
+    """Directory under models/ whose disk the cache limits are checked against."""
+    path = os.path.abspath(os.path.join(get_base_dir(), local_path or ""))
+    return path if os.path.isdir(path) else get_base_dir()
+
+def _json_bool(value, name):
+    """A JSON boolean, or the strings 'true'/'false'; anything else is a bad request."""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lower() in ("true", "false"):
+        return value.strip().lower() == "true"
+    raise ValueError(f"{name} must be true or false, got {value!r}")
+
+@PromptServer.instance.routes.get("/model_downloader/cache")
+async def get_cache_route(request):
+    # Dry run: lists downloaded models and which ones eviction would remove right now
+    try:
+        size = parse_size(request.query.get("size"))
+        report = cache_manager.report(_cache_dir(request.query.get("local_path")), size=size)
+        return web.json_response(report)
+    except (ValueError, TypeError) as e:
+        return web.json_response({"status": "bad_request", "error": str(e)}, status=400)
+
+@PromptServer.instance.routes.post("/model_downloader/cache")
+async def set_cache_route(request):
+    try:
+        json_data = await request.json()
+        cache_manager.configure(quota=json_data.get("quota"), min_free=json_data.get("min_free"))
+        return web.json_response({"status": "ok", **cache_manager.settings()})
+    except (ValueError, TypeError) as e:
+        return web.json_response({"status": "bad_request", "error": str(e)}, status=400)
+
+@PromptServer.instance.routes.post("/model_downloader/cache/evict")
+async def evict_cache_route(request):
+    try:
+        json_data = await request.json()
+        dry_run = _json_bool(json_data.get("dry_run", True), "dry_run")
+        evictions, shortfall = cache_manager.evict(
+            _cache_dir(json_data.get("local_path")),
+            size=parse_size(json_data.get("size")),
+            dry_run=dry_run,
+        )
+        return web.json_response({
+            "status": "ok",
+            "dry_run": dry_run,
+            "evicted": [{key: f[key] for key in ("path", "size", "last_used")} for f in evictions],
+            "shortfall": shortfall,
+        })
+    except (ValueError, TypeError) as e:
+        return web.json_response({"status": "bad_request", "error": str(e)}, status=400)
+
+@PromptServer.instance.routes.post("/model_downloader/cache/pin")
+async def pin_cache_route(request):
+    try:
+        json_data = await request.json()
+        path = os.path.join(get_base_dir(), json_data.get("path", ""))
+        pinned = _json_bool(json_data.get("pinned", True), "pinned")
+        if not download_manifest.set_pinned(path, pinned):
+            return web.json_response({"status": "not_found", "error": "Not a downloaded model"}, status=404)
+        return web.json_response({"status": "ok", "path": path, "pinned": pinned})
+    except (ValueError, TypeError, KeyError, AttributeError) as e:
+        # AttributeError: a JSON body that is not an object
+        return web.json_response({"status": "bad_request", "error": str(e)}, status=400)
+
+@PromptServer.instance.routes.get("/model_downloader/metrics")
+async def metrics_route(request):
+    jobs = download_scheduler.jobs()
+    text = download_metrics.render(
+        active=sum(1 for job in jobs if job["status"] == "running"),
+        queued=sum(1 for job in jobs if job["status"] == "queued"),
+    )
+    return web.Response(text=text, headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+@PromptServer.instance.routes.get("/model_downloader/status")
+async def status_route(request):
+    jobs = download_scheduler.jobs()
+    return web.json_response({
+        "active": [job for job in jobs if job["status"] == "running"],
+        "queued": [job for job in jobs if job["status"] == "queued"],
+        "recent": download_metrics.recent_downloads(),
+        "totals": download_metrics.totals(),
+    })
+
+@PromptServer.instance.routes.get("/model_downloader/search_cache")
+async def search_cache_stats_route(request):
+    return web.json_response(search_cache.stats())
+
+@PromptServer.instance.routes.get("/model_downloader/prefetch")
+async def get_prefetch_route(request):
+    return web.json_response({"enabled": workflow_prefetcher.enabled, "last_run": workflow_prefetcher.last_run})
+
+@PromptServer.instance.routes.post("/model_downloader/prefetch")
+async def set_prefetch_route(request):
+    try:
+        json_data = await request.json()
+        if "enabled" in json_data:
+            workflow_prefetcher.enabled = bool(json_data["enabled"])
+        if "priority" in json_data:
+            workflow_prefetcher.priority = int(json_data["priority"])
+        return web.json_response({"status": "ok", "enabled": workflow_prefetcher.enabled,
+                                  "priority": workflow_prefetcher.priority})
+    except (ValueError, TypeError) as e:
+        return web.json_response({"status": "bad_request", "error": str(e)}, status=400)
+
+@PromptServer.instance.routes.post("/model_downloader/bulk")
+async def start_bulk_download_route(request):
+    try:
+        json_data = await request.json()
+        entries = parse_manifest(json_data.get("manifest", ""), default_dir=json_data.get("local_path") or "checkpoints")
+        for entry in entries:
+            entry["token"] = entry["token"] or json_data.get("token")
+        if not entries:
+            return web.json_response({"status": "bad_request", "error": "Manifest is empty"}, status=400)
+        run = bulk_runs.start(
+            entries,
+            max_parallel=json_data.get("max_parallel", 4),
+            overwrite=bool(json_data.get("overwrite", False)),
+            skip_if_current=bool(json_data.get("skip_if_current", True)),
+        )
+        return web.json_response({"status": "started", "run_id": run.run_id, "models": len(entries)})
+    except Exception as e:
+        return web.json_response({"status": "bad_request", "error": str(e)}, status=400)
+
+@PromptServer.instance.routes.get("/model_downloader/bulk")
+async def list_bulk_downloads_route(request):
+    return web.json_response({"runs": [run.to_dict() for run in bulk_runs.runs()]})
+
+@PromptServer.instance.routes.get("/model_downloader/bulk/{run_id}")
+async def get_bulk_download_route(request):
+    run = bulk_runs.get(request.match_info["run_id"])
+    if run is None:
+        return web.json_response({"status": "not_found", "error": "No such bulk run"}, status=404)
+    return web.json_response(run.to_dict())
+
+@PromptServer.instance.routes.post("/model_downloader/bulk/{run_id}/cancel")
+async def cancel_bulk_download_route(request):
+    if bulk_runs.cancel(request.match_info["run_id"]):
+        return web.json_response({"status": "cancelled"})
+    return web.json_response({"status": "not_found", "error": "No running bulk download"}, status=404)
+
 __all__ = [
     "NODE_CLASS_MAPPINGS",
     "NODE_DISPLAY_NAME_MAPPINGS",
@@ -0,0 +1,383 @@
+"""
+Benchmark for DownloadManager.download_with_progress against a local HTTP stand-in server.
+
+The server generates file contents on the fly (a repeating random block, or zeros
+with --sparse so 20 GB sources cost nothing) and supports Range requests,
+Content-Disposition, chunked or Content-Length responses, added latency and a
+per-connection bandwidth cap. Every case runs in a fresh child process so CPU
+time, peak RSS and syscall counts belong to that download alone.
+
+Usage (from the repository root):
+    python bench/bench_download.py
+    python bench/bench_download.py --sizes 100M,1G --chunk-sizes 64K,1M,8M --output new.json
+    python bench/bench_download.py --sizes 20G --sparse --modes segmented --dest /mnt/scratch
+    python bench/bench_download.py --compare old.json --output new.json --fail-threshold 10
+
+Results are JSON: one record per case with the median of --repeat runs and the
+individual samples. With --compare, throughput and CPU are compared case by case
+against a previous result file, and the exit code is 1 if any case got slower by
+more than --fail-threshold percent.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import re
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULT_MARKER = "BENCH_RESULT "
+BLOCK_SIZE = 1024 * 1024
+
+def parse_size(text):
+    """'64K', '100M', '20G' or a plain byte count."""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMG]?)I?B?\s*', str(text).upper())
+    if not match:
+        raise ValueError(f"Invalid size: {text}")
+    return int(float(match.group(1)) * 1024 ** " KMG".index(match.group(2) or " "))
+
+def format_size(size):
+    for unit in ("", "K", "M", "G"):
+        if size < 1024 or unit == "G":
+            return f"{size:g}{unit}"
+        size /= 1024
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """
+    Serves /file?size=N with optional query flags:
+    chunked=1 (no Content-Length, no ranges), ranges=0, latency=seconds before the
+    response, rate=bytes per second per connection, name=Content-Disposition filename,
+    sparse=1 (all zeros).
+    """
+    protocol_version = "HTTP/1.1"
+    random_block = os.urandom(BLOCK_SIZE)
+    zero_block = bytes(BLOCK_SIZE)
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def _respond(self, send_body):
+        query = {key: values[-1] for key, values in parse_qs(urlparse(self.path).query).items()}
+        size = int(query.get("size", 0))
+        chunked = query.get("chunked") == "1"
+        ranges = query.get("ranges", "1") == "1" and not chunked
+        latency = float(query.get("latency", 0))
+        rate = float(query.get("rate", 0))
+        block = self.zero_block if query.get("sparse") == "1" else self.random_block
+
+        if latency:
+            time.sleep(latency)
+
+        start, end = 0, size - 1
+        status = 200
+        range_header = self.headers.get("Range")
+        if ranges and range_header:
+            match = re.fullmatch(r'bytes=(\d*)-(\d*)', range_header.strip())
+            if match and match.group(1):
+                start = int(match.group(1))
+                end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+                status = 206
+        length = max(end - start + 1, 0)
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("ETag", f'"bench-{size}-{query.get("sparse", "0")}"')
+        if query.get("name"):
+            self.send_header("Content-Disposition", f'attachment; filename="{query["name"]}"')
+        if ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        if chunked:
+            self.send_header("Transfer-Encoding", "chunked")
+        else:
+            self.send_header("Content-Length", str(length))
+        self.end_headers()
+        if not send_body:
+            return
+
+        view = memoryview(block)
+        offset, sent = start, 0
+        started = time.monotonic()
+        try:
+            while sent < length:
+                block_offset = offset % BLOCK_SIZE
+                piece = view[block_offset:block_offset + min(BLOCK_SIZE - block_offset, length - sent, 256 * 1024)]
+                if chunked:
+                    self.wfile.write(f"{len(piece):x}\r\n".encode())
+                    self.wfile.write(piece)
+                    self.wfile.write(b"\r\n")
+                else:
+                    self.wfile.write(piece)
+                offset += len(piece)
+                sent += len(piece)
+                if rate:
+                    ahead = sent / rate - (time.monotonic() - started)
+                    if ahead > 0:
+                        time.sleep(ahead)
+            if chunked:
+                self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Client went away (e.g. a cancelled segment)
+
+def start_server():
+    """Run the stand-in server on a free port in a background thread; returns its base URL."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def read_proc_io():
+    """
+    read()/write()-family syscall counters for this process (Linux only). Socket
+    receives via recv_into are not included; use --strace for a full count.
+    """
+    try:
+        with open("/proc/self/io") as f:
+            values = dict(line.split(": ") for line in f.read().splitlines())
+        return int(values["syscr"]), int(values["syscw"])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+class _CountingCallback:
+    def __init__(self):
+        self.calls = 0
+
+    def set_progress(self, percentage, details=None):
+        self.calls += 1
+
+def run_case(case):
+    """Run one download in this process and return its measurements."""
+    sys.path.insert(0, REPO_ROOT)
+    from nodes.download_utils import DownloadManager
+
+    DownloadManager.progress_interval = case["progress_interval"]
+    if case["progress_interval"] == 0:
+        DownloadManager.progress_min_percent = 0
+    callback = _CountingCallback()
+    dest = tempfile.mkdtemp(prefix="ez_dl_bench_", dir=case.get("dest"))
+    connections = 1 if case["mode"] == "single" else case["connections"]
+
+    cpu_before = resource.getrusage(resource.RUSAGE_SELF)
+    reads_before, writes_before = read_proc_io()
+    started = time.perf_counter()
+    path = DownloadManager.download_with_progress(
+        case["url"],
+        dest,
+        filename=None if case["disposition"] else "bench.bin",
+        progress_callback=callback,
+        chunk_size=case["chunk_size"],
+        connections=connections,
+    )
+    elapsed = time.perf_counter() - started
+    cpu_after = resource.getrusage(resource.RUSAGE_SELF)
+    reads_after, writes_after = read_proc_io()
+
+    size = os.path.getsize(path)
+    os.remove(path)
+    os.rmdir(dest)
+    if size != case["size"]:
+        raise Exception(f"Downloaded {size} bytes, expected {case['size']}")
+
+    cpu = (cpu_after.ru_utime - cpu_before.ru_utime) + (cpu_after.ru_stime - cpu_before.ru_stime)
+    return {
+        "seconds": elapsed,
+        "throughput_mb_s": size / elapsed / (1024 * 1024),
+        "cpu_seconds": cpu,
+        "cpu_per_gb": cpu / (size / 1024 ** 3) if size else None,
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        "peak_rss_mb": cpu_after.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024),
+        "read_syscalls": reads_after - reads_before if reads_before is not None else None,
+        "write_syscalls": writes_after - writes_before if writes_before is not None else None,
+        "context_switches": (cpu_after.ru_nvcsw - cpu_before.ru_nvcsw) + (cpu_after.ru_nivcsw - cpu_before.ru_nivcsw),
+        "progress_callbacks": callback.calls,
+    }
+
+def case_key(case):
+    return (f"{format_size(case['size'])}/{case['transfer']}/{case['mode']}/"
+            f"chunk={format_size(case['chunk_size'])}/progress={case['progress_interval']:g}s")
+
+def build_cases(args, base_url):
+    cases = []
+    for size, chunk_size, mode, interval, transfer in itertools.product(
+            args.sizes, args.chunk_sizes, args.modes, args.progress_intervals, args.transfers):
+        if transfer == "chunked" and mode == "segmented":
+            continue  # No length, no ranges: always a single stream
+        query = f"size={size}&latency={args.latency}&rate={args.rate}"
+        if transfer == "chunked":
+            query += "&chunked=1"
+        if args.sparse:
+            query += "&sparse=1"
+        if args.disposition:
+            query += "&name=bench.bin"
+        case = {
+            "size": size,
+            "chunk_size": chunk_size,
+            "mode": mode,
+            "connections": args.connections,
+            "progress_interval": interval,
+            "transfer": transfer,
+            "disposition": args.disposition,
+            "url": f"{base_url}/file?{query}",
+            "dest": args.dest,
+        }
+        case["key"] = case_key(case)
+        cases.append(case)
+    return cases
+
+def run_in_child(case, use_strace=False):
+    """
+    Fresh interpreter per run so peak RSS and counters are not shared between cases.
+    With use_strace the child runs under `strace -f -c` and the total syscall count
+    is added (timings are then inflated by tracing overhead).
+    """
+    command = [sys.executable, os.path.abspath(__file__), "--run-case", json.dumps(case)]
+    strace_output = None
+    if use_strace:
+        fd, strace_output = tempfile.mkstemp(prefix="ez_dl_bench_strace_")
+        os.close(fd)
+        command = ["strace", "-f", "-c", "-o", strace_output] + command
+    try:
+        completed = subprocess.run(command, capture_output=True, text=True)
+        for line in reversed(completed.stdout.splitlines()):
+            if line.startswith(RESULT_MARKER):
+                result = json.loads(line[len(RESULT_MARKER):])
+                break
+        else:
+            raise Exception(f"Case {case['key']} failed:\n{completed.stderr[-2000:]}")
+        if strace_output:
+            result["syscalls"] = parse_strace_total(strace_output)
+        return result
+    finally:
+        if strace_output:
+            os.remove(strace_output)
+
+def parse_strace_total(path):
+    """Total call count from an `strace -c` summary (whole child process, including startup)."""
+    with open(path) as f:
+        for line in f:
+            fields = line.split()
+            if fields and fields[-1] == "total":
+                return int(fields[3])
+    return None
+
+def summarize(case, samples):
+    result = {key: case[key] for key in ("key", "size", "chunk_size", "mode", "connections",
+                                          "progress_interval", "transfer", "disposition")}
+    for metric in samples[0]:
+        values = [sample[metric] for sample in samples if sample[metric] is not None]
+        result[metric] = statistics.median(values) if values else None
+    result["samples"] = samples
+    return result
+
+def compare(results, baseline_path, threshold):
+    """Print per-case changes against a previous run; returns the cases that regressed."""
+    with open(baseline_path) as f:
+        baseline = {case["key"]: case for case in json.load(f)["results"]}
+    regressions = []
+    print(f"{'case':<60} {'MB/s':>18} {'CPU s':>16} {'RSS MB':>16}", file=sys.stderr)
+    for result in results:
+        old = baseline.get(result["key"])
+        if old is None:
+            print(f"{result['key']:<60} (new case)", file=sys.stderr)
+            continue
+        change = (result["throughput_mb_s"] / old["throughput_mb_s"] - 1) * 100
+        print(f"{result['key']:<60} "
+              f"{old['throughput_mb_s']:>7.1f} → {result['throughput_mb_s']:>7.1f} "
+              f"{old['cpu_seconds']:>6.2f} → {result['cpu_seconds']:>6.2f} "
+              f"{old['peak_rss_mb']:>6.0f} → {result['peak_rss_mb']:>6.0f}"
+              f"{'  REGRESSION' if change < -threshold else ''}", file=sys.stderr)
+        if change < -threshold:
+            regressions.append(result["key"])
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="100M", help="comma-separated file sizes (default 100M)")
+    parser.add_argument("--chunk-sizes", default="64K,1M,4M", help="comma-separated chunk_size values")
+    parser.add_argument("--modes", default="single,segmented", help="single and/or segmented")
+    parser.add_argument("--connections", type=int, default=8, help="connections in segmented mode")
+    parser.add_argument("--progress-intervals", default="0.5,0",
+                        help="comma-separated progress callback intervals in seconds (0 = every chunk)")
+    parser.add_argument("--transfers", default="length", help="length and/or chunked transfer encoding")
+    parser.add_argument("--latency", type=float, default=0, help="seconds of latency per request")
+    parser.add_argument("--rate", type=parse_size, default=0, help="bandwidth cap per connection, e.g. 50M")
+    parser.add_argument("--sparse", action="store_true", help="serve zeros (cheap multi-GB sources)")
+    parser.add_argument("--disposition", action="store_true", help="name the file via Content-Disposition")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case (median is reported)")
+    parser.add_argument("--dest", default=None, help="directory for the downloaded files (default: temp dir)")
+    parser.add_argument("--output", default=None, help="write JSON results here instead of stdout")
+    parser.add_argument("--compare", default=None, help="previous JSON result file to compare against")
+    parser.add_argument("--fail-threshold", type=float, default=10,
+                        help="with --compare, fail if throughput drops more than this many percent")
+    parser.add_argument("--strace", action="store_true", help="also count all syscalls with strace -c (slower)")
+    parser.add_argument("--run-case", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        # Child mode: keep the download's own prints off the result line
+        result = run_case(json.loads(args.run_case))
+        print(RESULT_MARKER + json.dumps(result))
+        return 0
+
+    args.sizes = [parse_size(size) for size in args.sizes.split(",")]
+    args.chunk_sizes = [parse_size(size) for size in args.chunk_sizes.split(",")]
+    args.modes = [mode.strip() for mode in args.modes.split(",")]
+    args.progress_intervals = [float(value) for value in args.progress_intervals.split(",")]
+    args.transfers = [transfer.strip() for transfer in args.transfers.split(",")]
+
+    if args.strace and shutil.which("strace") is None:
+        parser.error("--strace needs strace on PATH")
+
+    server, base_url = start_server()
+    cases = build_cases(args, base_url)
+    results = []
+    try:
+        for number, case in enumerate(cases, 1):
+            print(f"[{number}/{len(cases)}] {case['key']}", file=sys.stderr)
+            samples = [run_in_child(case, args.strace) for _ in range(args.repeat)]
+            results.append(summarize(case, samples))
+            print(f"    {results[-1]['throughput_mb_s']:.1f} MB/s, {results[-1]['cpu_seconds']:.2f} s CPU, "
+                  f"{results[-1]['peak_rss_mb']:.0f} MB RSS", file=sys.stderr)
+    finally:
+        server.shutdown()
+
+    report = {
+        "created_at": time.time(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("run_case", "output", "compare")},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+    else:
+        print(json.dumps(report, indent=1))
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.fail_threshold)
+        if regressions:
+            print(f"{len(regressions)} case(s) regressed by more than {args.fail_threshold:g}%", file=sys.stderr)
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,7 +13,7 @@ const extension = {
         console.log(">>> nodeData.name:", nodeData.name);
         console.log(">>> nodeData:", nodeData);
         
-        if (nodeData.name === 'HF Downloader' || nodeData.name === 'Auto Model Downloader' || nodeData.name === 'CivitAI Downloader') {
+        if (nodeData.name === 'HF Downloader' || nodeData.name === 'Auto Model Downloader' || nodeData.name === 'CivitAI Downloader' || nodeData.name === 'Bulk Downloader') {
             console.log(">>> MATCHED NODE TYPE:", nodeData.name);
             
             const onNodeCreated = nodeType.prototype.onNodeCreated;
@@ -97,10 +97,30 @@ const extension = {
             };
 
             // Add setProgress method to show download progress
-            nodeType.prototype.setProgress = function (progress) {
-                console.log(">>> setProgress called:", progress);
+            nodeType.prototype.setProgress = function (progress, stats) {
                 this.progress = progress; // Expects 0.0-1.0 for ComfyUI core rendering
-                this.setDirtyCanvas(true, true);
+                this.downloadStats = stats || null; // bytes/total/speed/eta from the server
+                this.setDirtyCanvas(true, false);
+            };
+
+            // Show speed and ETA under the widgets while a download is running
+            const onDrawForeground = nodeType.prototype.onDrawForeground;
+            nodeType.prototype.onDrawForeground = function (ctx) {
+                onDrawForeground?.apply(this, arguments);
+                const stats = this.downloadStats;
+                if (!stats || !stats.speed || this.progress >= 1) return;
+                
+                const mbps = (stats.speed / (1024 * 1024)).toFixed(1);
+                let text = `${mbps} MB/s`;
+                if (stats.eta !== null && stats.eta !== undefined) {
+                    const eta = Math.round(stats.eta);
+                    text += ` · ETA ${Math.floor(eta / 60)}:${String(eta % 60).padStart(2, "0")}`;
+                }
+                ctx.save();
+                ctx.font = "11px sans-serif";
+                ctx.fillStyle = "#aaa";
+                ctx.fillText(text, 10, this.size[1] - 6);
+                ctx.restore();
             };
         }
     },
@@ -108,19 +128,31 @@ const extension = {
     async setup() {
         console.log(">>> Extension setup() called");
         
-        api.addEventListener("progress", ({ detail }) => {
-            console.log(">>> Progress event:", detail);
+        const applyProgress = (detail) => {
             if (!detail.node) return;
             
             const node = app.graph.getNodeById(detail.node);
-            if (!node || !["HF Downloader", "Auto Model Downloader", "CivitAI Downloader"].includes(node.type)) return;
+            if (!node || !["HF Downloader", "Auto Model Downloader", "CivitAI Downloader", "Bulk Downloader"].includes(node.type)) return;
             
             if (detail.value === undefined || detail.max === undefined || detail.max === 0) return;
             
             const progress = detail.value / detail.max; // 0.0 to 1.0, not 0 to 100
-            console.log(">>> Calling setProgress with:", progress);
             if (node.setProgress) {
-                node.setProgress(progress);
+                node.setProgress(progress, {
+                    downloaded: detail.downloaded,
+                    total: detail.total,
+                    speed: detail.speed,
+                    eta: detail.eta,
+                });
+            }
+        };
+        
+        api.addEventListener("progress", ({ detail }) => applyProgress(detail));
+        
+        // The server batches updates from all active downloads into one event
+        api.addEventListener("model_downloader_progress", ({ detail }) => {
+            for (const update of detail.downloads || []) {
+                applyProgress(update);
             }
         });
     }
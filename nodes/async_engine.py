@@ -0,0 +1,260 @@
+import aiohttp
+import asyncio
+import os
+import queue
+import shutil
+import threading
+import time
+from tqdm import tqdm
+from urllib.parse import urlparse
+from .download_utils import (DownloadManager, _ProgressTracker, _StreamingHasher, _Throttle,
+                             sanitize_filename)
+from .model_store import normalize_sha256
+from .download_retry import CircuitOpen, classify, is_retryable_status, parse_retry_after
+from .download_metrics import download_metrics
+
+_sessions = {}
+_loop_lock = threading.Lock()
+_private_loop = None
+
+def set_event_loop(loop):
+    """Run async downloads on this loop (ComfyUI's server loop, set at startup)."""
+    DownloadManager.event_loop = loop
+
+def get_event_loop():
+    """The loop async downloads run on; starts a private one if none was set."""
+    global _private_loop
+    loop = getattr(DownloadManager, 'event_loop', None)
+    if loop is not None and not loop.is_closed():
+        return loop
+    with _loop_lock:
+        if _private_loop is None:
+            _private_loop = asyncio.new_event_loop()
+            threading.Thread(target=_private_loop.run_forever, daemon=True).start()
+        return _private_loop
+
+def _get_session():
+    # One pooled session per loop; aiohttp sessions are bound to the loop that created them
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        session = aiohttp.ClientSession(
+            read_bufsize=DownloadManager.async_read_buffer,
+            connector=aiohttp.TCPConnector(limit=0, limit_per_host=0),
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=300),
+        )
+        _sessions[loop] = session
+    return session
+
+class _FileWriter:
+    """
+    Writes, hashes, throttles and reports progress on a dedicated thread so the
+    event loop only ever reads from the network. At most `max_pending` chunks are
+    in flight; the reader awaits a free slot before queueing more (backpressure).
+    """
+
+    def __init__(self, loop, temp_path, progress, hasher, throttle, cancel_event, node_id_str, max_pending=8):
+        self.loop = loop
+        self.temp_path = temp_path
+        self.progress = progress
+        self.hasher = hasher
+        self.throttle = throttle
+        self.cancel_event = cancel_event
+        self.node_id_str = node_id_str
+        self.slots = asyncio.Semaphore(max_pending)
+        self.queue = queue.Queue()
+        self.error = None
+        self.done = loop.create_future()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    async def write(self, data):
+        if self.error:
+            raise self.error
+        await self.slots.acquire()
+        self.queue.put(data)
+
+    async def close(self):
+        self.queue.put(None)
+        await self.done
+        if self.error:
+            raise self.error
+
+    def _run(self):
+        try:
+            written = 0
+            with open(self.temp_path, 'wb') as file:
+                while True:
+                    data = self.queue.get()
+                    if data is None:
+                        break
+                    try:
+                        if self.error is None:
+                            # Chunks may already be queued when the user cancels
+                            DownloadManager._check_cancel(self.cancel_event, self.node_id_str)
+                            file.write(data)
+                            if self.hasher:
+                                self.hasher.feed(written, data)
+                            written += len(data)
+                            self.progress.update(len(data))
+                            self.throttle.consume(len(data), self.cancel_event)
+                    except Exception as e:
+                        self.error = e
+                    finally:
+                        self.loop.call_soon_threadsafe(self.slots.release)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.loop.call_soon_threadsafe(self._set_done)
+
+    def _set_done(self):
+        if not self.done.done():
+            self.done.set_result(None)
+
+async def download_async(url, save_path, filename=None, progress_callback=None, params=None,
+                         chunk_size=None, node_id=None, cancel_event=None, expected_sha256=None, **kwargs):
+    """
+    aiohttp counterpart of DownloadManager.download_with_progress for the event loop.
+    Streams a single connection with large read buffers while a writer thread does
+    the file I/O, so many downloads can share one loop. Supports cancel, progress,
+    bandwidth limits and SHA256 verification, and retries transient failures with
+    DownloadManager's retry policy and circuit breaker. Unlike the thread engine it
+    does not split a file into ranges or resume a partial one: every retry starts
+    over. Extra kwargs (e.g. connections) are ignored.
+    """
+    chunk_size = chunk_size or DownloadManager.async_read_buffer
+    cancel_event = cancel_event or threading.Event()
+    node_id_str = str(node_id) if node_id is not None else None
+    expected_sha256 = normalize_sha256(expected_sha256)
+
+    if node_id_str:
+        with DownloadManager._lock:
+            DownloadManager.active_downloads[node_id_str] = cancel_event
+
+    # Filled in by _download_once for the metrics
+    stats = {'ttfb': None, 'bytes': 0, 'retries': 0}
+    started = time.monotonic()
+    status, error, result = 'failed', None, None
+    host = urlparse(url).netloc.lower()
+    try:
+        wait = DownloadManager.circuit_breaker.wait_time(host)
+        if wait > 0:
+            raise CircuitOpen(f"Too many recent failures from {host}; try again in {wait:.0f}s")
+        result = await _download_with_retries(url, save_path, filename, progress_callback, params, chunk_size,
+                                              cancel_event, node_id_str, expected_sha256, stats)
+        status = 'completed'
+        return result
+    except Exception as e:
+        status = 'cancelled' if cancel_event.is_set() else 'failed'
+        error = e
+        raise
+    finally:
+        download_metrics.observe_download(url, host, status, stats['bytes'], time.monotonic() - started,
+                                          ttfb=stats['ttfb'], retries=stats['retries'], error=error, path=result,
+                                          engine='async')
+        if node_id_str:
+            with DownloadManager._lock:
+                if DownloadManager.active_downloads.get(node_id_str) is cancel_event:
+                    del DownloadManager.active_downloads[node_id_str]
+
+def _classify(error):
+    """download_retry.classify, extended with aiohttp's errors."""
+    if isinstance(error, aiohttp.ClientResponseError):
+        headers = error.headers or {}
+        return is_retryable_status(error.status), parse_retry_after(headers.get('Retry-After'))
+    if isinstance(error, (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError)):
+        return True, None
+    return classify(error)
+
+async def _download_with_retries(url, save_path, filename, progress_callback, params, chunk_size,
+                                 cancel_event, node_id_str, expected_sha256, stats):
+    """_download_once, retried with backoff on transient failures."""
+    host = urlparse(url).netloc.lower()
+    policy = DownloadManager.retry_policy
+    attempt = 0
+    while True:
+        try:
+            result = await _download_once(url, save_path, filename, progress_callback, params, chunk_size,
+                                          cancel_event, node_id_str, expected_sha256, stats)
+            DownloadManager.circuit_breaker.record_success(host)
+            return result
+        except Exception as e:
+            retryable, retry_after = _classify(e)
+            if not retryable or cancel_event.is_set():
+                raise
+            DownloadManager.circuit_breaker.record_failure(host)
+            attempt += 1
+            if attempt >= policy.max_attempts:
+                raise
+            delay = max(policy.delay(attempt - 1, retry_after), DownloadManager.circuit_breaker.wait_time(host))
+            print(f"Download attempt {attempt} failed ({str(e)}), retrying in {delay:.1f}s "
+                  f"({attempt + 1}/{policy.max_attempts})")
+            stats['retries'] += 1
+            # Sleep on the loop, waking up often enough to notice a cancel
+            deadline = time.monotonic() + delay
+            while time.monotonic() < deadline:
+                DownloadManager._check_cancel(cancel_event, node_id_str)
+                await asyncio.sleep(min(0.5, deadline - time.monotonic()))
+            DownloadManager._check_cancel(cancel_event, node_id_str)
+
+async def _download_once(url, save_path, filename, progress_callback, params, chunk_size,
+                         cancel_event, node_id_str, expected_sha256, stats):
+    """One attempt: stream the whole file to a fresh .tmp file, verify it and move it into place."""
+    temp_path = None
+    progress = None
+    full_path = None
+    started = time.monotonic()
+    try:
+        async with _get_session().get(url, params=params) as response:
+            if stats['ttfb'] is None:
+                stats['ttfb'] = time.monotonic() - started
+            response.raise_for_status()
+            total_size = response.content_length or 0
+
+            if not filename:
+                filename = DownloadManager._extract_filename(response, url)
+            filename = sanitize_filename(filename)
+
+            full_path = os.path.join(save_path, filename)
+            temp_path = full_path + '.tmp'
+            print(f"Downloading to: {full_path} (async)")
+
+            if DownloadManager.cache_manager is not None:
+                await asyncio.get_running_loop().run_in_executor(
+                    None, DownloadManager.cache_manager.ensure_space, save_path, full_path, total_size)
+
+            with tqdm(total=total_size, unit='iB', unit_scale=True, desc=filename) as pbar:
+                progress = _ProgressTracker(total_size, pbar, progress_callback)
+                hasher = _StreamingHasher(temp_path) if expected_sha256 else None
+                throttle = _Throttle(DownloadManager.limiter, temp_path, str(response.url))
+                writer = _FileWriter(asyncio.get_running_loop(), temp_path, progress, hasher, throttle,
+                                     cancel_event, node_id_str)
+                try:
+                    async for data in response.content.iter_chunked(chunk_size):
+                        DownloadManager._check_cancel(cancel_event, node_id_str)
+                        await writer.write(data)
+                finally:
+                    await writer.close()
+
+        if hasher:
+            actual_sha256 = await asyncio.get_running_loop().run_in_executor(None, hasher.finalize)
+            if actual_sha256 != expected_sha256:
+                raise Exception(f"Hash mismatch for {filename}: expected {expected_sha256}, got {actual_sha256}")
+            print(f"Verified SHA256: {actual_sha256}")
+
+        await asyncio.get_running_loop().run_in_executor(None, shutil.move, temp_path, full_path)
+        print(f"===== DOWNLOAD COMPLETE =====")
+        print(f"Successfully downloaded: {full_path}")
+        return full_path
+
+    except Exception as e:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+            print(f"Cleaned up temporary file: {temp_path}")
+        print(f"Error occurred during download: {str(e)}")
+        raise
+    finally:
+        if progress is not None:
+            stats['bytes'] += progress.downloaded
+        if DownloadManager.cache_manager is not None and full_path:
+            DownloadManager.cache_manager.release(full_path)
@@ -1,6 +1,6 @@
 import asyncio
 from .workflow_scanner import scan_workflow
-from .model_search import search_for_model
+from .model_search import search_for_models
 from .utils import get_model_path, check_model_exists
 from server import PromptServer
 from ..base_downloader import BaseModelDownloader
@@ -68,8 +68,9 @@ class AutoModelDownloader(BaseModelDownloader):
                     if not self.missing_models:  # Check if list is empty
                         return
                     
-                    for model in self.missing_models:
-                        result = await search_for_model(model['filename'])
+                    # All filenames are searched concurrently over one shared session
+                    results = await search_for_models([model['filename'] for model in self.missing_models])
+                    for model, result in zip(self.missing_models, results):
                         if result and result.get('repo_id'):  # Only add if we have a valid repo_id
                             model['repo_id'] = result['repo_id']
                             valid_models.append(model)
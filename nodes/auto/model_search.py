@@ -1,13 +1,15 @@
+import asyncio
 import aiohttp
 import re
+from .search_cache import search_cache
 
-_model_cache = {}
 
-async def search_for_model(filename):
+async def search_for_model(filename, session=None):
     # Check cache first
     cache_key = filename.lower()
-    if cache_key in _model_cache:
-        return _model_cache[cache_key]
+    cached, repo_id = search_cache.get(cache_key)
+    if cached:
+        return {"repo_id": repo_id, "filename": filename} if repo_id else None
 
     def extract_model_components(filename):
         name_without_extension = re.sub(r'\.[^/.]+$', '', filename)
@@ -40,23 +42,66 @@ async def search_for_model(filename):
         if components["version"]:
             search_queries.append(f"{components['core_name']}_{components['version']}")
         search_queries.append(components["core_name"])
-    search_queries.append("_".join([components["core_name"], *components["tags"]]))
+    search_queries.append("_".join(part for part in [components["core_name"], *components["tags"]] if part))
+    # Drop empty and repeated queries, keeping their order
+    search_queries = list(dict.fromkeys(query for query in search_queries if query))
 
-    async with aiohttp.ClientSession() as session:
-        for query in search_queries:
-            async with session.get(f"{base_url}?full=true&search={query}") as response:
-                if response.status == 200:
-                    repos = await response.json()
-                    if repos:
-                        for repo in repos:
-                            match = next(
-                                (sibling for sibling in repo.get("siblings", []) if sibling["rfilename"] == filename),
-                                None
-                            )
-                            if match:
-                                result = {"repo_id": repo["modelId"], "filename": filename}
-                                # Cache the result
-                                _model_cache[cache_key] = result
-                                return result
-    _model_cache[cache_key] = None
-    return None
+    async def run_query(query):
+        async with session.get(f"{base_url}?full=true&search={query}") as response:
+            if response.status == 200:
+                repos = await response.json()
+                for repo in repos or []:
+                    match = next(
+                        (sibling for sibling in repo.get("siblings", []) if sibling["rfilename"] == filename),
+                        None
+                    )
+                    if match:
+                        return {"repo_id": repo["modelId"], "filename": filename}
+        return None
+
+    owns_session = session is None
+    if owns_session:
+        session = aiohttp.ClientSession()
+    
+    # Run all queries at once but take results in priority order: a more specific
+    # query wins over a broader one even if the broader one answers first. Once a
+    # query matches, only the lower-priority ones still running are cancelled.
+    tasks = [asyncio.ensure_future(run_query(query)) for query in search_queries]
+    result = None
+    failed = False
+    try:
+        for task in tasks:
+            try:
+                result = await task
+            except aiohttp.ClientError as e:
+                print(f"[Search] Query failed for {filename}: {str(e)}")
+                failed = True
+                continue
+            if result:
+                break
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if owns_session:
+            await session.close()
+    
+    # Cache the result; a "not found" is only trusted if every query actually completed
+    if result or not failed:
+        search_cache.put(cache_key, result["repo_id"] if result else None)
+    return result
+
+async def search_for_models(filenames, max_concurrency=8):
+    """
+    Search for many filenames concurrently over one pooled session.
+    Returns results in the same order as filenames.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    connector = aiohttp.TCPConnector(limit=max_concurrency * 3, limit_per_host=max_concurrency * 3)
+    
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async def bounded_search(filename):
+            async with semaphore:
+                return await search_for_model(filename, session=session)
+        
+        return await asyncio.gather(*(bounded_search(filename) for filename in filenames))
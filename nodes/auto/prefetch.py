@@ -0,0 +1,171 @@
+import asyncio
+import os
+import time
+from .workflow_scanner import scan_workflow
+from .model_search import search_for_models
+from ..base_downloader import BaseModelDownloader, download_manifest
+from ..download_utils import DownloadManager
+from ..hf.hf_download import HFDownloader
+from ..hf.hf_utils import get_hf_file_metadata, hf_resolve_url, hf_source
+from ..cai.cai_download import CivitAIDownloader
+
+# Downloader nodes whose widgets already say exactly what to fetch
+DOWNLOADER_NODES = {
+    "HF Downloader": HFDownloader,
+    "CivitAI Downloader": CivitAIDownloader,
+}
+
+class WorkflowPrefetcher(BaseModelDownloader):
+    """
+    Starts downloading every model a queued workflow needs as soon as the prompt
+    is submitted, instead of one at a time as the nodes execute.
+
+    Downloader nodes in the prompt are started in background mode with their own
+    inputs. Other missing files found by scan_workflow are fetched from the URL
+    they were last downloaded from (download manifest) or from a Hugging Face
+    search. Everything goes through the download scheduler, so when a node later
+    asks for the same file it attaches to the running job instead of starting over.
+
+    prefetch() runs on the server's event loop, so the scan (a stat walk of
+    models/), the manifest lookups and the search (whose SQLite cache may wait on
+    its lock) all run on executor threads.
+    """
+
+    def __init__(self, enabled=False, priority=10):
+        super().__init__()
+        self.enabled = enabled
+        # Behind interactive downloads; a node asking for the same file pulls it forward
+        self.priority = priority
+        self.last_run = None
+        self._tasks = set()
+
+    def update_status(self, status_text, progress=None, details=None):
+        pass  # Not a node; there is nothing to report progress to
+
+    def on_prompt(self, json_data):
+        """Prompt handler for PromptServer.add_on_prompt_handler; never blocks or fails the prompt."""
+        try:
+            prompt = json_data.get("prompt")
+            if self.enabled and isinstance(prompt, dict):
+                task = asyncio.ensure_future(self.prefetch(prompt))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+        except Exception as e:
+            print(f"[Prefetch] Could not start prefetch: {str(e)}")
+        return json_data
+
+    async def prefetch(self, prompt):
+        """Resolve and queue the workflow's downloads. Returns a summary per file."""
+        loop = asyncio.get_running_loop()
+        started = time.time()
+        results = []
+
+        # Downloader nodes first: their inputs are exact
+        covered = set()
+        for node_id, node in prompt.items():
+            if not isinstance(node, dict) or node.get("class_type") not in DOWNLOADER_NODES:
+                continue
+            inputs = {key: value for key, value in node.get("inputs", {}).items()
+                      if not isinstance(value, list)}  # Linked inputs are only known at execution
+            covered.add(os.path.basename(str(inputs.get("model_url", ""))))
+            results.append(loop.run_in_executor(None, self._start_node, node["class_type"], node_id, inputs))
+
+        # Then whatever else the workflow references but is not on disk
+        known, unresolved = await loop.run_in_executor(None, self._find_missing, prompt, covered)
+        for model, entry in known:
+            if (entry.get('source') or '').startswith('civitai:'):
+                # The recorded URL carries no token; the CivitAI node fetches it with its own
+                print(f"[Prefetch] Skipping {model['filename']}: CivitAI downloads need the node's API token")
+                results.append(self._summary(model['filename'], 'skipped', 'CivitAI token required'))
+            else:
+                results.append(loop.run_in_executor(None, self._start_known, model, entry))
+
+        if unresolved:
+            # On a loop of its own: the search cache lookups block
+            found = await loop.run_in_executor(
+                None, asyncio.run, search_for_models([model['filename'] for model in unresolved]))
+            for model, result in zip(unresolved, found):
+                if result and result.get('repo_id'):
+                    results.append(loop.run_in_executor(None, self._start_hf, model, result['repo_id']))
+                else:
+                    print(f"[Prefetch] No source found for {model['filename']}")
+                    results.append(self._summary(model['filename'], 'not_found'))
+
+        summary = [result if isinstance(result, dict) else await result for result in results]
+        self.last_run = {"started_at": started, "finished_at": time.time(), "downloads": summary}
+        print(f"[Prefetch] Queued {sum(1 for s in summary if s['status'] == 'queued')} of {len(summary)} downloads")
+        return summary
+
+    @staticmethod
+    def _summary(filename, status, error=None):
+        return {"filename": filename, "status": status, "error": error}
+
+    @staticmethod
+    def _find_missing(prompt, covered):
+        """
+        Models the prompt references that are not on disk and no downloader node
+        covers, as (model, manifest entry) pairs for ones downloaded before and a
+        list of the rest.
+        """
+        known, unresolved = [], []
+        seen = set()
+        for model in asyncio.run(scan_workflow(prompt)):
+            identifier = (model['filename'], model['local_path'])
+            if model['filename'] in covered or '://' in model['local_path'] or identifier in seen:
+                continue
+            seen.add(identifier)
+            entry = download_manifest.find_source(model['filename'])
+            if entry is not None:
+                known.append((model, entry))
+            else:
+                unresolved.append(model)
+        return known, unresolved
+
+    def _start_node(self, class_type, node_id, inputs):
+        name = os.path.basename(str(inputs.get("model_url", ""))) or class_type
+        try:
+            DOWNLOADER_NODES[class_type]().download(node_id=node_id, **dict(inputs, background=True))
+            # The node decides for itself whether anything needs downloading
+            return self._summary(name, 'started')
+        except Exception as e:
+            print(f"[Prefetch] Could not prefetch node {node_id}: {str(e)}")
+            return self._summary(name, 'failed', str(e))
+
+    def _start_known(self, model, entry):
+        # Download again into the folder it was in before
+        print(f"[Prefetch] {model['filename']} → {entry['url']} (previously downloaded)")
+        return self._start(model['filename'], os.path.dirname(entry['path']), entry['url'],
+                           entry.get('sha256'), entry.get('source'), entry.get('revision'), entry.get('etag'))
+
+    def _start_hf(self, model, repo_id):
+        print(f"[Prefetch] {model['filename']} → {repo_id}")
+        save_path = self.prepare_download_path(model['local_path'], model['filename'])
+        try:
+            metadata = get_hf_file_metadata(repo_id, model['filename']) or {}
+        except Exception:
+            metadata = {}
+        url = hf_resolve_url(repo_id, model['filename'], metadata.get('commit') or "main")
+        return self._start(model['filename'], save_path, url, metadata.get('sha256'),
+                           hf_source(repo_id, model['filename']), metadata.get('commit'))
+
+    def _start(self, filename, save_path, url, expected_sha256, source, revision=None, etag=None):
+        try:
+            os.makedirs(save_path, exist_ok=True)
+            self.handle_download(
+                DownloadManager.download_with_progress,
+                save_path=save_path,
+                filename=filename,
+                priority=self.priority,
+                expected_sha256=expected_sha256,
+                source=source,
+                revision=revision,
+                etag=etag,
+                background=True,
+                url=url,
+            )
+            return self._summary(filename, 'queued')
+        except Exception as e:
+            print(f"[Prefetch] Could not prefetch {filename}: {str(e)}")
+            return self._summary(filename, 'failed', str(e))
+
+workflow_prefetcher = WorkflowPrefetcher(enabled=os.environ.get("COMFYUI_EZ_DL_PREFETCH", "").lower() in ("1", "true", "yes"))
@@ -0,0 +1,134 @@
+import os
+import sqlite3
+import threading
+import time
+from ..download_metrics import download_metrics
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "search_cache.sqlite3")
+
+class SearchCache:
+    """
+    Persistent filename -> repo_id cache for Hugging Face model searches.
+
+    Stored in SQLite so it survives restarts and every write is atomic. Found repos
+    and "not found" results expire separately (hit_ttl / miss_ttl seconds), and the
+    table is kept to max_entries by evicting the least recently used rows.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, hit_ttl=30 * 24 * 3600, miss_ttl=24 * 3600, max_entries=5000):
+        self.path = path
+        self.hit_ttl = hit_ttl
+        self.miss_ttl = miss_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        if not self._initialized:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS search_results ("
+                " key TEXT PRIMARY KEY,"
+                " repo_id TEXT,"
+                " created_at REAL NOT NULL,"
+                " last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON search_results (last_access)")
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    def get(self, key):
+        """
+        Returns (True, result) for a fresh entry, where result is None for a cached
+        "not found", or (False, None) when the caller has to search.
+        """
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connect()
+                try:
+                    row = conn.execute(
+                        "SELECT repo_id, created_at FROM search_results WHERE key = ?", (key,)
+                    ).fetchone()
+                    if row is not None:
+                        repo_id, created_at = row
+                        ttl = self.hit_ttl if repo_id else self.miss_ttl
+                        if now - created_at < ttl:
+                            with conn:
+                                conn.execute("UPDATE search_results SET last_access = ? WHERE key = ?", (now, key))
+                            self.hits += 1
+                            download_metrics.cache_hit('search')
+                            return True, repo_id
+                        with conn:
+                            conn.execute("DELETE FROM search_results WHERE key = ?", (key,))
+                finally:
+                    conn.close()
+            except sqlite3.Error as e:
+                print(f"[SearchCache] Read failed: {str(e)}")
+            self.misses += 1
+            return False, None
+
+    def put(self, key, repo_id):
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connect()
+                try:
+                    with conn:
+                        conn.execute(
+                            "INSERT OR REPLACE INTO search_results (key, repo_id, created_at, last_access) "
+                            "VALUES (?, ?, ?, ?)",
+                            (key, repo_id, now, now),
+                        )
+                        count = conn.execute("SELECT COUNT(*) FROM search_results").fetchone()[0]
+                        overflow = count - self.max_entries
+                        if overflow > 0:
+                            conn.execute(
+                                "DELETE FROM search_results WHERE key IN ("
+                                " SELECT key FROM search_results ORDER BY last_access ASC LIMIT ?)",
+                                (overflow,),
+                            )
+                            self.evictions += overflow
+                finally:
+                    conn.close()
+            except sqlite3.Error as e:
+                print(f"[SearchCache] Write failed: {str(e)}")
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute("DELETE FROM search_results")
+            finally:
+                conn.close()
+
+    def stats(self):
+        with self._lock:
+            try:
+                conn = self._connect()
+                try:
+                    entries, found = conn.execute(
+                        "SELECT COUNT(*), COUNT(repo_id) FROM search_results"
+                    ).fetchone()
+                finally:
+                    conn.close()
+            except sqlite3.Error:
+                entries, found = None, None
+            return {
+                "path": self.path,
+                "entries": entries,
+                "found_entries": found,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ttl": self.hit_ttl,
+                "miss_ttl": self.miss_ttl,
+                "max_entries": self.max_entries,
+            }
+
+search_cache = SearchCache()
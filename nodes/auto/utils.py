@@ -1,4 +1,5 @@
 import os
+from ..base_downloader import model_index
 
 def get_base_dir():
     # Get the current file's directory
@@ -8,18 +9,17 @@ def get_base_dir():
     return models_dir
 
 def get_model_dirs():
-    models_dir = get_base_dir()
-    if not os.path.exists(models_dir):
-        print(f"Models directory not found: {models_dir}")
+    # Top-level model folders, from the index shared with the downloader nodes
+    if not os.path.exists(model_index.root):
+        print(f"Models directory not found: {model_index.root}")
         return ["models"]  # Return default if directory doesn't exist
-    model_dirs = [d for d in os.listdir(models_dir) if os.path.isdir(os.path.join(models_dir, d))]
+    model_dirs = model_index.get_dirs(max_depth=0)
     return model_dirs if model_dirs else ["models"]  # Return default if no subdirectories found
 
 def get_model_path(model_type):
     base_dir = get_base_dir()
     return os.path.join(base_dir, model_type)
 
-def check_model_exists(filename, model_type):
-    local_path = get_model_path(model_type)
-    full_path = os.path.join(local_path, filename)
-    return os.path.exists(full_path)
+def check_model_exists(filename, model_type=None):
+    # Looks in every models/ subfolder, not just the one model_type guesses
+    return model_index.exists(filename)
@@ -1,4 +1,4 @@
-from .utils import get_model_path
+from .utils import get_model_path, check_model_exists
 from .constants import EXTENSION_MAP
 import os
 
@@ -38,6 +38,11 @@ async def scan_workflow(prompt):
                 if not local_path:
                     continue
 
+            # Skip models already on disk, wherever they live under models/
+            if check_model_exists(input_path):
+                print(f"[Scanner] Found locally: {input_path}")
+                continue
+
             missing_models.append({
                 "filename": filename,  # JUST the filename
                 "repo_id": None,
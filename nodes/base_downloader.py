@@ -1,5 +1,13 @@
 from server import PromptServer
+from .download_utils import DownloadManager, download_scheduler
+from .model_store import model_store
+from .shared_cache import shared_cache
+from .model_index import ModelIndex
+from .download_manifest import DownloadManifest
+from .download_metrics import download_metrics
+from .cache_manager import CacheManager, parse_size
 import os
+import threading
 
 def get_base_dir():
     current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -7,44 +15,83 @@ def get_base_dir():
     models_dir = os.path.join(base_dir, 'models')
     return models_dir
 
+def _env_size(name):
+    """Size limit from an environment variable; an unparsable value means no limit."""
+    value = os.environ.get(name)
+    try:
+        return parse_size(value)
+    except ValueError:
+        print(f"[Cache] Ignoring invalid {name}={value!r}; expected a size like '500G'. No limit is applied")
+        return 0
+
+model_index = ModelIndex(get_base_dir())
+download_manifest = DownloadManifest(os.path.join(get_base_dir(), '.ez_dl_manifest.json'))
+cache_manager = CacheManager(
+    download_manifest,
+    quota=_env_size('COMFYUI_EZ_DL_QUOTA'),
+    min_free=_env_size('COMFYUI_EZ_DL_MIN_FREE'),
+)
+DownloadManager.cache_manager = cache_manager
+
 def get_model_dirs(recursive=True, max_depth=3):
     """
     Get model directories.
     If recursive=True, returns all subdirectories up to max_depth levels deep.
     Returns paths relative to the models directory (e.g., 'loras', 'loras/SDXL', 'loras/flux').
+    Served from a cached index that only re-lists directories whose mtime changed.
     """
-    models_dir = get_base_dir()
-    
-    if not os.path.exists(models_dir):
+    if not os.path.exists(model_index.root):
         return ["models"]
     
-    model_dirs = []
-    
-    def scan_directory(current_path, relative_path="", depth=0):
-        if depth > max_depth:
-            return
-        
-        try:
-            items = os.listdir(current_path)
-            for item in sorted(items):
-                item_path = os.path.join(current_path, item)
-                if os.path.isdir(item_path) and not item.startswith('.'):
-                    # Build relative path
-                    if relative_path:
-                        rel_path = os.path.join(relative_path, item)
-                    else:
-                        rel_path = item
-                    
-                    model_dirs.append(rel_path)
-                    # Recursively scan subdirectories
-                    scan_directory(item_path, rel_path, depth + 1)
-        except (PermissionError, OSError):
-            pass  # Skip directories we can't access
-    
-    scan_directory(models_dir)
+    model_dirs = model_index.get_dirs(max_depth if recursive else 0)
     
     # Return sorted list, or default if empty
-    return sorted(model_dirs) if model_dirs else ["models"]
+    return model_dirs if model_dirs else ["models"]
+
+class ProgressReporter:
+    """
+    Coalesces progress updates from all downloads into one batched websocket event.
+    Updates are buffered per node (only the latest is kept) and flushed every
+    `interval` seconds as a single "model_downloader_progress" message.
+    """
+
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def report(self, node_id, progress, details=None):
+        payload = {"node": node_id, "value": progress, "max": 100}
+        if details:
+            payload.update(details)
+        with self._lock:
+            self._pending[str(node_id)] = payload
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        if progress >= 100:
+            # Don't make completion wait for the next tick
+            self._wakeup.set()
+
+    def flush(self):
+        with self._lock:
+            updates = list(self._pending.values())
+            self._pending.clear()
+        if updates:
+            PromptServer.instance.send_sync("model_downloader_progress", {"downloads": updates})
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error sending progress: {str(e)}")
+
+progress_reporter = ProgressReporter()
 
 class BaseModelDownloader:
     RETURN_TYPES = ()
@@ -56,16 +103,12 @@ class BaseModelDownloader:
         self.progress = 0.0
         self.node_id = None
 
-    def set_progress(self, percentage):
-        self.update_status(f"Downloading... {percentage:.1f}%", percentage)
+    def set_progress(self, percentage, details=None):
+        self.update_status(f"Downloading... {percentage:.1f}%", percentage, details)
 
-    def update_status(self, status_text, progress=None):
+    def update_status(self, status_text, progress=None, details=None):
         if progress is not None and hasattr(self, 'node_id'):
-            PromptServer.instance.send_sync("progress", {
-                "node": self.node_id,
-                "value": progress,
-                "max": 100
-            })
+            progress_reporter.report(self.node_id, progress, details)
 
     def prepare_download_path(self, local_path, filename):
         # Just create the base directory, don't include the filename
@@ -74,21 +117,105 @@ class BaseModelDownloader:
             os.makedirs(full_path, exist_ok=True)
         return full_path
     
-    def handle_download(self, download_func, save_path, filename, overwrite=False, **kwargs):
+    def find_current_download(self, source, save_path, revision=None):
+        """
+        Fast path before any network resolution: the manifest entry for a file
+        previously downloaded from `source` into save_path, if it is still on disk
+        unchanged and upstream was checked recently. Otherwise None.
+        An immutable revision (a commit SHA) that matches the recorded one is
+        current without any recheck.
+        """
+        entry = download_manifest.lookup(source, save_path)
+        pinned = entry is not None and revision is not None and entry.get('revision') == revision
+        if entry is not None and (pinned or download_manifest.is_current(entry)):
+            print(f"Already downloaded and current: {entry['path']}")
+            download_metrics.cache_hit('manifest')
+            self.update_status("Complete!", 100)
+            return entry
+        return None
+    
+    def keep_existing(self, file_path, overwrite):
+        """True if file_path is already there and must not be overwritten (no network needed)."""
+        if os.path.exists(file_path) and not overwrite:
+            print(f"File already exists and overwrite is False: {file_path}")
+            download_manifest.mark_accessed(file_path)
+            download_metrics.cache_hit('existing')
+            return True
+        return False
+    
+    def handle_download(self, download_func, save_path, filename, overwrite=False, priority=0, expected_sha256=None,
+                        source=None, skip_if_current=True, background=False, revision=None, etag=None, **kwargs):
         try:
             file_path = os.path.join(save_path, filename)
-            if os.path.exists(file_path) and not overwrite:
-                print(f"File already exists and overwrite is False: {file_path}")
+            if self.keep_existing(file_path, overwrite):
+                return {}
+            
+            # Overwrite only when upstream changed: same hash (or URL) as the recorded download means nothing to do
+            if skip_if_current and download_manifest.matches(file_path, sha256=expected_sha256, url=kwargs.get('url'),
+                                                             revision=revision, etag=etag):
+                print(f"File is up to date with upstream, skipping download: {file_path}")
+                download_manifest.touch(file_path, revision=revision)
+                download_metrics.cache_hit('manifest')
+                self.update_status("Complete!", 100)
                 return {}
             
+            # Content-addressed store hit: link the blob into place, no network needed
+            if expected_sha256 and model_store.materialize(expected_sha256, file_path):
+                download_manifest.record(file_path, source=source, url=kwargs.get('url'), sha256=expected_sha256,
+                                         revision=revision, etag=etag)
+                download_metrics.cache_hit('store')
+                self.update_status("Complete!", 100)
+                return {}
+            
+            # Another ComfyUI install on this host may already have fetched it into the shared cache
+            shared_cache_dir = shared_cache.dir_for(save_path, get_base_dir())
+            if shared_cache_dir and (not overwrite or expected_sha256):
+                if shared_cache.materialize(shared_cache_dir, save_path, filename, expected_sha256):
+                    download_manifest.record(file_path, source=source, url=kwargs.get('url'), sha256=expected_sha256,
+                                             revision=revision, etag=etag)
+                    download_metrics.cache_hit('shared')
+                    self.update_status("Complete!", 100)
+                    return {}
+            if shared_cache_dir:
+                kwargs['shared_cache_dir'] = shared_cache_dir
+                kwargs['refresh_cache'] = overwrite and not expected_sha256
+            
             kwargs['save_path'] = save_path
             kwargs['filename'] = filename  # CRITICAL: Pass filename to download function
             kwargs['node_id'] = self.node_id
-            result = download_func(**kwargs)
-            if result is None:
+            kwargs['expected_sha256'] = expected_sha256
+            # Go through the global scheduler so concurrent nodes share the download limits
+            job = download_scheduler.submit(download_func=download_func, priority=priority, **kwargs)
+            
+            if background:
+                # Return right away; the prompt queue moves on while the file downloads
+                print(f"Downloading in the background (job {job.job_id}): {file_path}")
+                job.future_for(self.node_id).add_done_callback(
+                    lambda future: self._finish_background_download(future, expected_sha256, source, kwargs.get('url'),
+                                                                    revision, etag))
                 return {}
-            self.update_status("Complete!", 100)
+            
+            self._finish_download(job.wait(node_id=self.node_id), expected_sha256, source, kwargs.get('url'), revision,
+                                  etag)
             return {}
         except Exception as e:
             print(f"Error occurred: {str(e)}")
-            raise e
\ No newline at end of file
+            raise e
+    
+    def _finish_download(self, result, expected_sha256, source, url, revision=None, etag=None):
+        if result is None:
+            return
+        if model_store.enabled:
+            # The download already checked expected_sha256 while streaming
+            model_store.ingest(result, expected_sha256, verified=bool(expected_sha256))
+        download_manifest.record(result, source=source, url=url, sha256=expected_sha256, revision=revision,
+                                 etag=etag)
+        # So the workflow scan sees the new file right away
+        model_index.invalidate()
+        self.update_status("Complete!", 100)
+    
+    def _finish_background_download(self, future, expected_sha256, source, url, revision=None, etag=None):
+        try:
+            self._finish_download(future.result(), expected_sha256, source, url, revision, etag)
+        except Exception as e:
+            print(f"Background download failed: {str(e)}")
\ No newline at end of file
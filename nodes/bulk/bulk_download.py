@@ -0,0 +1,398 @@
+from ..base_downloader import BaseModelDownloader, get_model_dirs, progress_reporter
+from ..download_utils import DownloadManager, get_civitai_model_id_and_version
+from ..hf.hf_utils import get_hf_file_metadata, hf_resolve_url, hf_source, is_commit_sha, parse_hf_revision_url
+from ..cai.cai_download import CivitAIDownloader
+from ..model_store import normalize_sha256
+import concurrent.futures
+import json
+import os
+import re
+import threading
+import time
+from urllib.parse import unquote, urlparse
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+def parse_manifest(manifest, default_dir="checkpoints"):
+    """
+    Parse a model manifest into a list of entry dicts (url, local_path, filename, sha256, token).
+
+    Accepts a JSON or YAML list (or a mapping with a "models" list and optional
+    "local_path"/"token" defaults) whose items are URLs or objects, or plain text
+    with one `<url> [local_path] [sha256]` per line and # comments.
+    Entries are deduplicated by URL and target directory.
+    """
+    defaults = {"local_path": default_dir, "token": None}
+    data = manifest
+    if isinstance(manifest, str):
+        text = manifest.strip()
+        if text[:1] in ('[', '{'):
+            data = json.loads(text)
+        elif re.search(r'^\s*(-\s|\w+:\s)', text, re.MULTILINE):
+            if yaml is None:
+                raise Exception("PyYAML is required for YAML manifests")
+            data = yaml.safe_load(text)
+        else:
+            data = _parse_text(text)
+
+    if isinstance(data, dict):
+        defaults["local_path"] = data.get("local_path") or data.get("dir") or default_dir
+        defaults["token"] = data.get("token")
+        data = data.get("models") or data.get("downloads") or []
+    if not isinstance(data, list):
+        raise Exception("Manifest must be a list of models")
+
+    entries = []
+    seen = set()
+    for item in data:
+        if isinstance(item, str):
+            item = {"url": item}
+        if not isinstance(item, dict):
+            raise Exception(f"Invalid manifest entry: {item!r}")
+        url = str(item.get("url") or item.get("model_url") or "").strip()
+        if not url:
+            raise Exception(f"Manifest entry without a URL: {item!r}")
+        entry = {
+            "url": url,
+            "local_path": item.get("local_path") or item.get("dir") or item.get("save_dir") or defaults["local_path"],
+            "filename": item.get("filename"),
+            "sha256": normalize_sha256(item.get("sha256")),
+            "token": item.get("token") or defaults["token"],
+            "revision": item.get("revision"),
+        }
+        key = (url, entry["local_path"])
+        if key in seen:
+            continue
+        seen.add(key)
+        entries.append(entry)
+    return entries
+
+def _parse_text(text):
+    items = []
+    for line in text.splitlines():
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            continue
+        parts = line.split()
+        item = {"url": parts[0]}
+        for part in parts[1:]:
+            if re.fullmatch(r'[0-9a-fA-F]{64}', part):
+                item["sha256"] = part
+            else:
+                item["local_path"] = part
+        items.append(item)
+    return items
+
+class BulkItem(BaseModelDownloader):
+    """One manifest entry: resolves its source, then downloads through handle_download."""
+
+    def __init__(self, run, index, entry):
+        super().__init__()
+        self.run = run
+        self.index = index
+        self.entry = entry
+        # Own id so each file can be cancelled and tracked by the scheduler
+        self.node_id = f"{run.run_id}/{index}"
+        self.status = "pending"
+        self.progress = 0.0
+        self.details = {}
+        self.error = None
+        self.filename = entry.get("filename")
+        self.save_path = None
+        self.url = None
+        self.sha256 = entry.get("sha256")
+        self.source = entry.get("source")
+        self.revision = None
+        self.etag = entry.get("etag")
+        self.params = None
+
+    def update_status(self, status_text, progress=None, details=None):
+        if progress is not None:
+            self.progress = progress
+            if details:
+                self.details = details
+            self.run.report()
+
+    def resolve(self):
+        """Turn the entry's URL (CivitAI, Hugging Face or direct) into a download URL, filename and expected hash."""
+        self.status = "resolving"
+        url = self.entry["url"]
+        if 'civitai.com' in url or re.fullmatch(r'\d+', url):
+            model_id, version_id = get_civitai_model_id_and_version(url)
+            if not model_id:
+                raise Exception(f"Invalid CivitAI URL: {url}")
+            token = self.entry.get("token")
+            filename, self.url, sha256 = CivitAIDownloader().get_download_filename_url(model_id, version_id, token)
+            self.source = self.source or f"civitai:{model_id}:{version_id or 'latest'}"
+            self.params = {'token': token} if token else None
+        elif re.match(r'https?://', url) and 'huggingface.co' not in url:
+            # Any other direct link is downloaded as is
+            self.url = url
+            self.source = self.source or f"url:{url}"
+            filename = self.filename or unquote(urlparse(url).path.rsplit('/', 1)[-1])
+            if not filename:
+                raise Exception(f"Cannot tell the filename of {url}; set one in the manifest")
+            sha256 = self.sha256
+        else:
+            repo_id, revision, filename = parse_hf_revision_url(url)
+            if not repo_id or not filename:
+                raise Exception(f"Invalid Hugging Face URL: {url}")
+            revision = self.entry.get("revision") or revision
+            if is_commit_sha(revision):
+                # Already pinned (e.g. snapshot entries, whose hashes come from the tree listing)
+                commit, sha256 = revision, self.sha256
+            else:
+                metadata = get_hf_file_metadata(repo_id, filename, revision) or {}
+                commit, sha256 = metadata.get('commit'), self.sha256 or metadata.get('sha256')
+                self.etag = metadata.get('etag')
+            self.revision = commit
+            self.url = hf_resolve_url(repo_id, filename, commit or revision)
+            self.source = self.source or hf_source(repo_id, filename, revision)
+        self.filename = self.filename or os.path.basename(filename)
+        self.sha256 = self.sha256 or normalize_sha256(sha256)
+        self.save_path = self.prepare_download_path(self.entry["local_path"], self.filename)
+        self.status = "resolved"
+
+    def download(self, overwrite=False, skip_if_current=True):
+        if os.path.exists(os.path.join(self.save_path, self.filename)) and not overwrite:
+            self.status = "skipped"
+            self.update_status("Complete!", 100)
+            return
+        self.status = "downloading"
+        self.handle_download(
+            DownloadManager.download_with_progress,
+            save_path=self.save_path,
+            filename=self.filename,
+            overwrite=overwrite,
+            expected_sha256=self.sha256,
+            source=self.source,
+            skip_if_current=skip_if_current,
+            revision=self.revision,
+            etag=self.etag,
+            url=self.url,
+            progress_callback=self,
+            params=self.params,
+        )
+        self.status = "completed"
+        self.update_status("Complete!", 100)
+
+    def to_dict(self):
+        return {
+            "url": self.entry["url"],
+            "filename": self.filename,
+            "local_path": self.entry["local_path"],
+            "status": self.status,
+            "progress": self.progress,
+            "downloaded": self.details.get("downloaded"),
+            "total": self.details.get("total"),
+            "speed": self.details.get("speed"),
+            "error": str(self.error) if self.error else None,
+        }
+
+class BulkDownload:
+    """
+    Downloads every entry of a manifest: metadata is resolved concurrently, then
+    files are fetched `max_parallel` at a time through the download scheduler
+    (which still applies its own global limits). Entries that resolve to the same
+    destination file are downloaded once.
+    """
+    resolve_workers = 8
+
+    def __init__(self, run_id, entries, node_id=None, max_parallel=4, overwrite=False, skip_if_current=True):
+        self.run_id = run_id
+        self.node_id = node_id
+        self.max_parallel = max(1, int(max_parallel))
+        self.overwrite = overwrite
+        self.skip_if_current = skip_if_current
+        self.items = [BulkItem(self, index, entry) for index, entry in enumerate(entries)]
+        self.status = "pending"
+        self.cancelled = False
+        self.started_at = None
+        self.finished_at = None
+
+    def run(self):
+        self.status = "running"
+        self.started_at = time.time()
+        print(f"[Bulk] Run {self.run_id}: {len(self.items)} models")
+
+        with concurrent.futures.ThreadPoolExecutor(self.resolve_workers) as pool:
+            for item, future in [(item, pool.submit(item.resolve)) for item in self.items]:
+                try:
+                    future.result()
+                except Exception as e:
+                    item.status, item.error = "failed", e
+                    print(f"[Bulk] Could not resolve {item.entry['url']}: {str(e)}")
+
+        # Different URLs can still point at the same file
+        destinations = {}
+        for item in self.items:
+            if item.status != "resolved":
+                continue
+            key = os.path.join(item.save_path, item.filename)
+            if key in destinations:
+                item.status = "duplicate"
+                item.progress = 100
+            else:
+                destinations[key] = item
+
+        with concurrent.futures.ThreadPoolExecutor(self.max_parallel) as pool:
+            futures = {pool.submit(self._download, item): item for item in destinations.values()}
+            concurrent.futures.wait(futures)
+
+        self.status = "cancelled" if self.cancelled else "completed"
+        self.finished_at = time.time()
+        self.report()
+        counts = self.counts()
+        print(f"[Bulk] Run {self.run_id} finished: {counts}")
+        return counts
+
+    def _download(self, item):
+        if self.cancelled:
+            item.status = "cancelled"
+            return
+        try:
+            item.download(self.overwrite, self.skip_if_current)
+        except Exception as e:
+            item.status = "cancelled" if self.cancelled else "failed"
+            item.error = e
+            print(f"[Bulk] {item.filename} failed: {str(e)}")
+
+    def cancel(self):
+        self.cancelled = True
+        for item in self.items:
+            if item.status in ("downloading", "resolved"):
+                DownloadManager.cancel_download(item.node_id)
+
+    def raise_for_failures(self):
+        """Raise if the run was cancelled or any file failed, naming the failures."""
+        if self.cancelled:
+            raise Exception("Download cancelled by user")
+        failed = [item for item in self.items if item.status == "failed"]
+        if failed:
+            raise Exception(f"{len(failed)} of {len(self.items)} downloads failed: " +
+                            ", ".join(f"{item.filename or item.entry['url']} ({item.error})" for item in failed))
+
+    def counts(self):
+        counts = {}
+        for item in self.items:
+            counts[item.status] = counts.get(item.status, 0) + 1
+        return counts
+
+    def aggregate(self):
+        """Overall progress (mean of the items) plus summed bytes and speed."""
+        progress = sum(100 if item.status in ("failed", "cancelled") else item.progress
+                       for item in self.items) / max(len(self.items), 1)
+        downloaded = sum(item.details.get("downloaded") or 0 for item in self.items)
+        total = sum(item.details.get("total") or 0 for item in self.items)
+        speed = sum(item.details.get("speed") or 0 for item in self.items
+                    if item.status == "downloading")
+        return {
+            "progress": progress,
+            "downloaded": downloaded,
+            "total": total,
+            "speed": speed,
+            "eta": (total - downloaded) / speed if speed > 0 and total else None,
+        }
+
+    def report(self):
+        if self.node_id is not None:
+            aggregate = self.aggregate()
+            progress = aggregate.pop("progress")
+            progress_reporter.report(self.node_id, progress, aggregate)
+
+    def to_dict(self):
+        return {
+            "run_id": self.run_id,
+            "node_id": self.node_id,
+            "status": self.status,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "counts": self.counts(),
+            **self.aggregate(),
+            "items": [item.to_dict() for item in self.items],
+        }
+
+class BulkRuns:
+    """Registry of bulk runs, started from the node or the HTTP route."""
+    history_size = 20
+
+    def __init__(self):
+        self._runs = {}
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def create(self, entries, node_id=None, **kwargs):
+        with self._lock:
+            self._counter += 1
+            run_id = f"bulk-{self._counter}"
+            run = BulkDownload(run_id, entries, node_id=node_id, **kwargs)
+            self._runs[run_id] = run
+            finished = [r for r in self._runs.values() if r.finished_at is not None]
+            for old in sorted(finished, key=lambda r: r.finished_at)[:-self.history_size]:
+                del self._runs[old.run_id]
+        return run
+
+    def start(self, entries, **kwargs):
+        """Run in the background and return the run right away."""
+        run = self.create(entries, **kwargs)
+        threading.Thread(target=run.run, daemon=True).start()
+        return run
+
+    def get(self, run_id):
+        with self._lock:
+            return self._runs.get(run_id)
+
+    def runs(self):
+        with self._lock:
+            return list(self._runs.values())
+
+    def cancel(self, run_or_node_id):
+        """Cancel the unfinished run with this run id or node id. Returns True if one was found."""
+        key = str(run_or_node_id)
+        found = False
+        for run in self.runs():
+            if run.finished_at is None and key in (run.run_id, str(run.node_id)):
+                run.cancel()
+                found = True
+        return found
+
+bulk_runs = BulkRuns()
+
+class BulkDownloader(BaseModelDownloader):
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "manifest": ("STRING", {"multiline": True, "default": "# One model per line: <url> [local_path] [sha256]\n"}),
+                "local_path": (get_model_dirs(),),
+            },
+            "optional": {
+                "token_id": ("STRING", {"multiline": False, "default": ""}),
+                "max_parallel": ("INT", {"default": 4, "min": 1, "max": 32}),
+                "overwrite": ("BOOLEAN", {"default": False}),
+                "skip_if_current": ("BOOLEAN", {"default": True}),
+            },
+            "hidden": {
+                "node_id": "UNIQUE_ID"
+            }
+        }
+
+    FUNCTION = "download"
+
+    def download(self, manifest, local_path, node_id, token_id="", max_parallel=4, overwrite=False, skip_if_current=True):
+        self.node_id = node_id
+        entries = parse_manifest(manifest, default_dir=local_path)
+        for entry in entries:
+            entry["token"] = entry["token"] or token_id or None
+        if not entries:
+            print("[Bulk] Manifest is empty")
+            return {}
+
+        run = bulk_runs.create(entries, node_id=node_id, max_parallel=max_parallel,
+                               overwrite=overwrite, skip_if_current=skip_if_current)
+        run.run()
+        run.raise_for_failures()
+        return {}
@@ -0,0 +1,200 @@
+import os
+import shutil
+import threading
+import time
+
+_UNITS = {'': 1, 'B': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+def parse_size(value):
+    """Bytes from a number or a string like '500G', '1.5T' or '2048'. Empty/None means 0 (no limit)."""
+    if value is None or value == '':
+        return 0
+    if isinstance(value, (int, float)):
+        return max(int(value), 0)
+    text = str(value).strip().upper().removesuffix('IB').removesuffix('B')
+    unit = text[-1:] if text[-1:] in _UNITS else ''
+    number = text[:-1] if unit else text
+    return max(int(float(number) * _UNITS[unit]), 0)
+
+def _allocated(path):
+    """Bytes actually allocated on disk for path (0 if it does not exist)."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return 0
+    blocks = getattr(stat, 'st_blocks', None)
+    return blocks * 512 if blocks is not None else stat.st_size
+
+class CacheManager:
+    """
+    Keeps the disk use of downloaded models within limits. Before a download
+    writes its .tmp file, ensure_space() checks the quota (total size of the files
+    this node pack downloaded, per the download manifest) and the free-space floor
+    of the target disk, counting space promised to other running downloads. It
+    then deletes the least recently used downloads until the new file fits.
+    Pinned files, files being downloaded and files the pack did not download are
+    never touched.
+
+    A file's last use is the latest of its download, a queued prompt that names
+    it, a downloader node finding it already present, and its atime (if the
+    filesystem keeps one).
+    """
+
+    def __init__(self, manifest, quota=0, min_free=0):
+        self.manifest = manifest
+        self.quota = quota
+        self.min_free = min_free
+        self._reserved = {}
+        # Reentrant: ensure_space plans and evicts under one hold
+        self._lock = threading.RLock()
+
+    @property
+    def enabled(self):
+        return bool(self.quota or self.min_free)
+
+    def configure(self, quota=None, min_free=None):
+        if quota is not None:
+            self.quota = parse_size(quota)
+        if min_free is not None:
+            self.min_free = parse_size(min_free)
+
+    def settings(self):
+        return {"quota": self.quota, "min_free": self.min_free}
+
+    @staticmethod
+    def _key(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    def files(self):
+        """Downloaded files still on disk unchanged, least recently used first."""
+        files = []
+        for entry in self.manifest.entries():
+            try:
+                stat = os.stat(entry['path'])
+            except OSError:
+                continue
+            if stat.st_size != entry['size'] or int(stat.st_mtime) != int(entry['mtime']):
+                continue  # Replaced or edited since; no longer ours to delete
+            files.append({
+                "path": entry['path'],
+                "size": stat.st_size,
+                "downloaded_at": entry.get('downloaded_at'),
+                "last_used": max(entry.get('accessed_at') or 0, entry.get('downloaded_at') or 0, stat.st_atime),
+                "pinned": bool(entry.get('pinned')),
+                # A file with other hardlinks (model store, shared cache) frees nothing when deleted
+                "links": stat.st_nlink,
+                "device": stat.st_dev,
+            })
+        return sorted(files, key=lambda f: f['last_used'])
+
+    def plan(self, save_path, full_path=None, size=0):
+        """
+        Work out what to evict so a file of `size` bytes at full_path fits.
+        Returns (evictions, shortfall); a shortfall > 0 means it won't fit even then.
+        """
+        files = self.files()
+        target = self._key(full_path) if full_path else None
+        with self._lock:
+            reserved = dict(self._reserved)
+        if target or size:
+            reserved[target] = size  # Keyed None for a hypothetical download (dry runs)
+        busy = set(reserved)
+
+        quota_over = 0
+        if self.quota:
+            # The file being replaced stops counting once the download is moved over it
+            used = sum(f['size'] for f in files if self._key(f['path']) != target)
+            quota_over = used + sum(reserved.values()) - self.quota
+
+        free_short = 0
+        device = None
+        if self.min_free:
+            usage = shutil.disk_usage(save_path)
+            device = os.stat(save_path).st_dev
+            # Space a preallocated .tmp already holds is already gone from `free`
+            pending = sum(max(nbytes - (_allocated(path + '.tmp') if path else 0), 0) for path, nbytes in reserved.items())
+            free_short = self.min_free + pending - usage.free
+
+        evictions = []
+        for f in files:
+            if quota_over <= 0 and free_short <= 0:
+                break
+            if f['pinned'] or self._key(f['path']) in busy:
+                continue
+            frees = f['size'] if f['links'] == 1 and f['device'] == device else 0
+            if quota_over > 0 or frees:
+                evictions.append(f)
+                quota_over -= f['size']
+                free_short -= frees
+        return evictions, max(quota_over, free_short, 0)
+
+    def ensure_space(self, save_path, full_path, size):
+        """
+        Reserve room for a download of `size` bytes to full_path, evicting least
+        recently used downloads if needed. Raises if the limits can't be met.
+        Call release(full_path) when the download ends either way.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            evictions, shortfall = self.plan(save_path, full_path, size)
+            if shortfall > 0:
+                raise Exception(f"Not enough disk space for {os.path.basename(full_path)}: "
+                                f"{shortfall / 1024 ** 3:.2f} GB over the limit even after evicting "
+                                f"every unpinned model")
+            for f in evictions:
+                self._evict(f)
+            self._reserved[self._key(full_path)] = size
+
+    def release(self, full_path):
+        with self._lock:
+            self._reserved.pop(self._key(full_path), None)
+
+    def evict(self, save_path, size=0, dry_run=True):
+        """Bring usage within the limits (plus `size` spare bytes). Returns the files (to be) evicted."""
+        with self._lock:
+            evictions, shortfall = self.plan(save_path, size=size)
+            if not dry_run:
+                for f in evictions:
+                    self._evict(f)
+        return evictions, shortfall
+
+    def _evict(self, f):
+        try:
+            os.remove(f['path'])
+        except FileNotFoundError:
+            pass
+        self.manifest.remove(f['path'])
+        idle_days = (time.time() - f['last_used']) / 86400
+        print(f"[Cache] Evicted {f['path']} ({f['size'] / 1024 ** 3:.2f} GB, unused for {idle_days:.1f} days)")
+
+    def report(self, save_path, size=0):
+        """Dry-run listing: every tracked file, what eviction would remove now, and the current totals."""
+        evictions, shortfall = self.plan(save_path, size=size)
+        evicted = {f['path'] for f in evictions}
+        files = [dict(f, evict=f['path'] in evicted) for f in self.files()]
+        for f in files:
+            del f['device']
+        with self._lock:
+            reserved = sum(self._reserved.values())
+        return {
+            **self.settings(),
+            "used": sum(f['size'] for f in files),
+            "free": shutil.disk_usage(save_path).free,
+            "reserved": reserved,
+            "shortfall": shortfall,
+            "files": files,
+        }
+
+    def on_prompt(self, json_data):
+        """Prompt handler: files named in a queued prompt's inputs count as used now."""
+        try:
+            prompt = json_data.get("prompt")
+            if isinstance(prompt, dict):
+                names = {os.path.basename(value.replace('\\', '/'))
+                         for node in prompt.values() if isinstance(node, dict)
+                         for value in node.get("inputs", {}).values() if isinstance(value, str)}
+                self.manifest.mark_accessed(filenames=names)
+        except Exception as e:
+            print(f"[Cache] Could not record model use: {str(e)}")
+        return json_data
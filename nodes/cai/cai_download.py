@@ -1,6 +1,6 @@
 from ..base_downloader import BaseModelDownloader, get_model_dirs
 from ..download_utils import DownloadManager, get_civitai_model_id_and_version
-import requests
+from .civitai_api import civitai_client
 
 class CivitAIDownloader(BaseModelDownloader):
     base_url = 'https://civitai.com/api'
@@ -16,6 +16,8 @@ class CivitAIDownloader(BaseModelDownloader):
             "optional": {
                 "overwrite": ("BOOLEAN", {"default": True}),
                 "save_dir_override": ("STRING", {"default": ""}),
+                "skip_if_current": ("BOOLEAN", {"default": True}),
+                "background": ("BOOLEAN", {"default": False}),
             },
             "hidden": {
                 "node_id": "UNIQUE_ID"
@@ -31,53 +33,49 @@ class CivitAIDownloader(BaseModelDownloader):
         Logic:
         1. If version_id is provided, use that specific version
         2. If only model_id is provided, try as model ID first, then as version ID
-        3. Returns filename and download URL
+        3. Returns filename, download URL and SHA256 (None if CivitAI has no hash)
         """
-        headers = {"Authorization": f"Bearer {token_id}"}
+        # Metadata comes from civitai_client, which pools connections and caches responses
         
         # If we have a specific version_id from the URL
         if version_id:
-            return self._get_version_details(version_id, headers)
+            return self._get_version_details(version_id, token_id)
         
         # Try as model ID first
-        model_details_url = f'{self.base_url}/v1/models/{model_id}'
-        response = requests.get(model_details_url, headers=headers)
+        status_code, model_details = civitai_client.get_model(model_id, token_id)
         
-        if response.status_code == 200:
+        if status_code == 200:
             # Successfully got model details, find latest/specific version
-            model_details = response.json()
             model_versions = model_details.get('modelVersions', [])
             
             if not model_versions:
                 raise Exception(f"No versions found for model ID {model_id}")
             
             # Sort versions by creation date (newest first)
-            model_versions.sort(key=lambda x: x.get('createdAt', ''), reverse=True)
+            model_versions = sorted(model_versions, key=lambda x: x.get('createdAt', ''), reverse=True)
             latest_version = model_versions[0]
             
             return self._extract_file_info(latest_version)
         
-        elif response.status_code == 404:
+        elif status_code == 404:
             # Not a model ID, try as version ID
             print(f"Model ID {model_id} not found, trying as version ID...")
-            return self._get_version_details(model_id, headers)
+            return self._get_version_details(model_id, token_id)
         
         else:
-            raise Exception(f"Failed to fetch model details. Status code: {response.status_code}")
+            raise Exception(f"Failed to fetch model details. Status code: {status_code}")
     
-    def _get_version_details(self, version_id, headers):
+    def _get_version_details(self, version_id, token_id):
         """Get details for a specific model version."""
-        version_url = f'{self.base_url}/v1/model-versions/{version_id}'
-        response = requests.get(version_url, headers=headers)
+        status_code, version_details = civitai_client.get_version(version_id, token_id)
         
-        if response.status_code != 200:
-            raise Exception(f"Failed to fetch version {version_id}. Status code: {response.status_code}")
+        if status_code != 200:
+            raise Exception(f"Failed to fetch version {version_id}. Status code: {status_code}")
         
-        version_details = response.json()
         return self._extract_file_info(version_details)
     
     def _extract_file_info(self, version_details):
-        """Extract filename and download URL from version details."""
+        """Extract filename, download URL and SHA256 from version details."""
         files = version_details.get('files', [])
         
         if not files:
@@ -96,20 +94,26 @@ class CivitAIDownloader(BaseModelDownloader):
         
         filename = primary_file['name']
         download_url = primary_file['downloadUrl']
+        sha256 = primary_file.get('hashes', {}).get('SHA256')
         
-        return filename, download_url
+        return filename, download_url, sha256
     
-    def download(self, model_url, token_id, save_dir, node_id, overwrite=True, save_dir_override=""):
+    def download(self, model_url, token_id, save_dir, node_id, overwrite=True, save_dir_override="", skip_if_current=True, background=False):
         self.node_id = node_id
         model_id, version_id = get_civitai_model_id_and_version(model_url)
         
         if not model_id:
             raise Exception("Invalid CivitAI URL. Could not find model ID or version ID.")
             
-        filename, url = self.get_download_filename_url(model_id, version_id, token_id)
-        
         # Use override if provided, otherwise use dropdown selection
         final_path = save_dir_override if save_dir_override else save_dir
+        
+        # A file recorded for this model/version needs no API calls at all
+        source = f"civitai:{model_id}:{version_id or 'latest'}"
+        if skip_if_current and self.find_current_download(source, self.prepare_download_path(final_path, None)):
+            return {}
+        
+        filename, url, sha256 = self.get_download_filename_url(model_id, version_id, token_id)
         save_path = self.prepare_download_path(final_path, filename)
         
         return self.handle_download(
@@ -118,6 +122,10 @@ class CivitAIDownloader(BaseModelDownloader):
             save_path=save_path,
             filename=filename,
             overwrite=overwrite,
+            expected_sha256=sha256,
+            source=source,
+            skip_if_current=skip_if_current,
+            background=background,
             progress_callback=self,
             params={'token': token_id}
         )
\ No newline at end of file
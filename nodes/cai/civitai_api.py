@@ -0,0 +1,182 @@
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from ..download_metrics import download_metrics
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "metadata_cache.json")
+
+class CivitAIClient:
+    """
+    Pooled HTTP session plus a metadata cache for the CivitAI API.
+
+    Responses are cached per URL (and per token, since private models differ by
+    account) for `ttl` seconds. Stale entries are revalidated with If-None-Match /
+    If-Modified-Since, so an unchanged model costs a 304 instead of a full body.
+    404s are cached for `not_found_ttl`, which keeps the "model ID or version ID?"
+    fallback from re-probing every run. The cache is persisted to a JSON file so a
+    restart does not refetch everything.
+
+    Only the fields the downloader reads are kept (version ids and dates, and each
+    file's name, size, SHA256 and download URL), not whole API bodies with their
+    images and descriptions. Changes are written out at most every `save_delay`
+    seconds, and on exit.
+    """
+    base_url = 'https://civitai.com/api'
+    save_delay = 5.0
+    file_fields = ('name', 'downloadUrl', 'primary', 'sizeKB')
+
+    def __init__(self, cache_path=DEFAULT_CACHE_PATH, ttl=6 * 3600, not_found_ttl=3600, max_entries=2000):
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.not_found_ttl = not_found_ttl
+        self.max_entries = max_entries
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._cache = None
+        self._dirty = False
+        self._save_timer = None
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def get_model(self, model_id, token_id=None):
+        """Returns (status_code, json) for /v1/models/{id}, trimmed to its versions' files."""
+        status, data = self.get_json(f'{self.base_url}/v1/models/{model_id}', token_id, trim=self._trim_model)
+        if status == 200 and data:
+            # A model response already contains every version, so seed those too
+            for version in data.get('modelVersions', []):
+                if version.get('id') is not None:
+                    self._store(self._key(f'{self.base_url}/v1/model-versions/{version["id"]}', token_id),
+                                200, version, None, None)
+        return status, data
+
+    def get_version(self, version_id, token_id=None):
+        """Returns (status_code, json) for /v1/model-versions/{id}, trimmed to its files."""
+        return self.get_json(f'{self.base_url}/v1/model-versions/{version_id}', token_id, trim=self._trim_version)
+
+    @classmethod
+    def _trim_version(cls, version):
+        return {
+            'id': version.get('id'),
+            'createdAt': version.get('createdAt'),
+            'files': [dict({field: file.get(field) for field in cls.file_fields},
+                           hashes={'SHA256': (file.get('hashes') or {}).get('SHA256')})
+                      for file in version.get('files') or []],
+        }
+
+    @classmethod
+    def _trim_model(cls, model):
+        return {
+            'id': model.get('id'),
+            'modelVersions': [cls._trim_version(version) for version in model.get('modelVersions') or []],
+        }
+
+    def get_json(self, url, token_id=None, trim=None):
+        key = self._key(url, token_id)
+        with self._lock:
+            entry = self._load().get(key)
+        now = time.time()
+
+        if entry is not None:
+            ttl = self.ttl if entry['status'] == 200 else self.not_found_ttl
+            if now - entry['fetched_at'] < ttl:
+                download_metrics.cache_hit('civitai_metadata')
+                return entry['status'], entry['data']
+
+        headers = {}
+        if token_id:
+            headers['Authorization'] = f'Bearer {token_id}'
+        if entry is not None and entry['status'] == 200:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        response = self.session.get(url, headers=headers, timeout=30)
+
+        if response.status_code == 304 and entry is not None:
+            print(f"[CivitAI] Metadata unchanged: {url}")
+            download_metrics.cache_hit('civitai_metadata')
+            self._store(key, 200, entry['data'], entry.get('etag'), entry.get('last_modified'))
+            return 200, entry['data']
+
+        if response.status_code == 200:
+            data = response.json()
+            if trim is not None:
+                data = trim(data)
+            self._store(key, 200, data, response.headers.get('etag'), response.headers.get('last-modified'))
+            return 200, data
+
+        if response.status_code == 404:
+            self._store(key, 404, None, None, None)
+        return response.status_code, None
+
+    def clear(self):
+        with self._lock:
+            self._cache = {}
+            self._dirty = True
+        self.flush()
+
+    @staticmethod
+    def _key(url, token_id):
+        token_hash = hashlib.sha256(token_id.encode()).hexdigest()[:16] if token_id else ''
+        return f'{token_hash}:{url}'
+
+    def _load(self):
+        if self._cache is None:
+            try:
+                with open(self.cache_path, 'r', encoding='utf-8') as f:
+                    self._cache = json.load(f)
+            except (OSError, ValueError):
+                self._cache = {}
+        return self._cache
+
+    def _store(self, key, status, data, etag, last_modified):
+        with self._lock:
+            cache = self._load()
+            cache[key] = {
+                'status': status,
+                'data': data,
+                'etag': etag,
+                'last_modified': last_modified,
+                'fetched_at': time.time(),
+            }
+            # Keep the newest entries only
+            if len(cache) > self.max_entries:
+                oldest = sorted(cache, key=lambda k: cache[k]['fetched_at'])[:len(cache) - self.max_entries]
+                for old_key in oldest:
+                    del cache[old_key]
+            self._dirty = True
+            # Batch the writes of a burst of lookups into one save
+            if self._save_timer is None:
+                self._save_timer = threading.Timer(self.save_delay, self.flush)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+
+    def flush(self):
+        """Write pending cache changes to disk now."""
+        with self._save_lock:
+            with self._lock:
+                if self._save_timer is not None:
+                    self._save_timer.cancel()
+                    self._save_timer = None
+                if self._cache is None or not self._dirty:
+                    return
+                payload = json.dumps(self._cache)
+                self._dirty = False
+            temp_path = self.cache_path + '.tmp'
+            try:
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    f.write(payload)
+                os.replace(temp_path, self.cache_path)
+            except OSError as e:
+                print(f"[CivitAI] Could not save metadata cache: {str(e)}")
+
+civitai_client = CivitAIClient()
@@ -0,0 +1,176 @@
+import json
+import os
+import threading
+import time
+
+class DownloadManifest:
+    """
+    Local record of files this node pack has downloaded: where each came from
+    (source and URL), its size, mtime, SHA256 and upstream ETag, and when upstream
+    was last checked.
+    The cache manager also keeps each file's last use and pin state here.
+
+    Lets the downloader nodes answer "is this file already here and current?"
+    without touching the network: an entry only counts if the file on disk still
+    has the recorded size and mtime, and is trusted without rechecking upstream for
+    `recheck_interval` seconds.
+    """
+
+    def __init__(self, path, recheck_interval=24 * 3600):
+        self.path = path
+        self.recheck_interval = recheck_interval
+        self._entries = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(file_path):
+        return os.path.normcase(os.path.abspath(file_path))
+
+    def get(self, file_path):
+        """The entry for file_path if the file is unchanged since it was recorded, else None."""
+        with self._lock:
+            entry = self._load().get(self._key(file_path))
+        if entry is None:
+            return None
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        if stat.st_size != entry['size'] or int(stat.st_mtime) != int(entry['mtime']):
+            return None
+        return entry
+
+    def lookup(self, source, save_path):
+        """
+        Find an unchanged file downloaded from `source` (e.g. 'civitai:123:456')
+        into save_path, before the filename is even known.
+        """
+        save_dir = self._key(save_path)
+        with self._lock:
+            candidates = [
+                (key, entry) for key, entry in self._load().items()
+                if entry.get('source') == source and os.path.dirname(key) == save_dir
+            ]
+        for key, entry in candidates:
+            if self.get(entry['path']) is not None:
+                return entry
+        return None
+
+    def find_source(self, filename):
+        """
+        The most recent entry recorded for filename with a known URL, whether or
+        not the file is still on disk, so a deleted model can be fetched again.
+        """
+        with self._lock:
+            entries = [entry for entry in self._load().values()
+                       if entry.get('filename') == filename and entry.get('url')]
+        return max(entries, key=lambda entry: entry.get('downloaded_at', 0), default=None)
+
+    def is_current(self, entry):
+        return entry is not None and time.time() - entry.get('checked_at', 0) < self.recheck_interval
+
+    def matches(self, file_path, sha256=None, url=None, revision=None, etag=None):
+        """
+        True if file_path is unchanged on disk and was downloaded from the same
+        upstream content: same SHA256 when both are known, otherwise the same
+        content ETag (e.g. the git SHA1 of a small Hugging Face file), otherwise
+        the same pinned revision (commit), otherwise the same URL.
+        """
+        entry = self.get(file_path)
+        if entry is None:
+            return False
+        if sha256 and entry.get('sha256'):
+            return entry['sha256'] == sha256.lower()
+        if etag and entry.get('etag'):
+            return entry['etag'] == etag
+        if revision and entry.get('revision'):
+            return entry['revision'] == revision
+        return bool(url) and entry.get('url') == url
+
+    def record(self, file_path, source=None, url=None, sha256=None, revision=None, etag=None):
+        stat = os.stat(file_path)
+        now = time.time()
+        with self._lock:
+            previous = self._load().get(self._key(file_path), {})
+            self._load()[self._key(file_path)] = {
+                'path': os.path.abspath(file_path),
+                'filename': os.path.basename(file_path),
+                'source': source,
+                'url': url,
+                'sha256': sha256.lower() if sha256 else None,
+                'revision': revision,
+                'etag': etag,
+                'size': stat.st_size,
+                'mtime': stat.st_mtime,
+                'downloaded_at': now,
+                'checked_at': now,
+                'accessed_at': now,
+                'pinned': previous.get('pinned', False),
+            }
+            self._save()
+
+    def touch(self, file_path, revision=None):
+        """Mark file_path as checked against upstream just now (and current as of `revision`)."""
+        with self._lock:
+            entry = self._load().get(self._key(file_path))
+            if entry is not None:
+                entry['checked_at'] = time.time()
+                if revision:
+                    entry['revision'] = revision
+                self._save()
+
+    def entries(self):
+        """Copies of all entries, including ones whose file is gone or changed."""
+        with self._lock:
+            return [dict(entry) for entry in self._load().values()]
+
+    def mark_accessed(self, file_path=None, filenames=None):
+        """Record that a file (by path, or every entry with one of `filenames`) was just used."""
+        now = time.time()
+        names = set(filenames or ())
+        with self._lock:
+            entries = self._load()
+            if file_path is not None:
+                matched = [entries.get(self._key(file_path))]
+            else:
+                matched = [entry for entry in entries.values() if entry.get('filename') in names]
+            matched = [entry for entry in matched if entry is not None]
+            for entry in matched:
+                entry['accessed_at'] = now
+            if matched:
+                self._save()
+        return len(matched)
+
+    def set_pinned(self, file_path, pinned=True):
+        """Pinned files are never evicted. Returns False if file_path is not a recorded download."""
+        with self._lock:
+            entry = self._load().get(self._key(file_path))
+            if entry is None:
+                return False
+            entry['pinned'] = bool(pinned)
+            self._save()
+            return True
+
+    def remove(self, file_path):
+        with self._lock:
+            if self._load().pop(self._key(file_path), None) is not None:
+                self._save()
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def _save(self):
+        temp_path = self.path + '.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f, indent=1)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"[Manifest] Could not save {self.path}: {str(e)}")
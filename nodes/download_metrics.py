@@ -0,0 +1,158 @@
+import collections
+import threading
+import time
+
+class _Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense."""
+
+    def __init__(self, buckets):
+        self.buckets = sorted(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+
+    def render(self, name, lines):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{le="{float(bound)!r}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f'{name}_sum {self.sum!r}')
+        lines.append(f'{name}_count {self.count}')
+
+class DownloadMetrics:
+    """
+    Process-wide download instrumentation: counters and histograms for finished
+    downloads (bytes, duration, throughput, time to first byte, retries, outcome),
+    scheduler queue wait, shared transfers and cache hits, plus the most recent
+    downloads for the JSON status view. render() produces Prometheus text format.
+    """
+    prefix = "ez_dl"
+    recent_size = 100
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.downloads = collections.Counter()
+        self.bytes_by_host = collections.Counter()
+        self.retries = 0
+        self.joins = 0
+        self.cache_hits = collections.Counter()
+        self.duration = _Histogram([1, 5, 15, 30, 60, 120, 300, 600, 1200, 3600])
+        self.ttfb = _Histogram([0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30])
+        self.throughput = _Histogram([mb * 1024 * 1024 for mb in (1, 5, 10, 25, 50, 100, 250, 500, 1000)])
+        self.queue_wait = _Histogram([0.1, 1, 5, 15, 30, 60, 300, 900, 3600])
+        self.recent = collections.deque(maxlen=self.recent_size)
+        self.started_at = time.time()
+
+    def observe_download(self, url, host, status, nbytes, duration, ttfb=None, retries=0, error=None, path=None,
+                         engine='threads'):
+        """Record one finished download attempt (status: completed, failed or cancelled)."""
+        with self._lock:
+            self.downloads[status] += 1
+            self.bytes_by_host[host] += nbytes
+            self.retries += retries
+            self.duration.observe(duration)
+            if ttfb is not None:
+                self.ttfb.observe(ttfb)
+            throughput = nbytes / duration if duration > 0 else 0
+            if status == 'completed' and nbytes:
+                self.throughput.observe(throughput)
+            self.recent.appendleft({
+                "url": url,
+                "host": host,
+                "path": path,
+                "status": status,
+                "engine": engine,
+                "bytes": nbytes,
+                "duration": duration,
+                "throughput": throughput,
+                "ttfb": ttfb,
+                "retries": retries,
+                "error": str(error) if error else None,
+                "finished_at": time.time(),
+            })
+
+    def observe_queue_wait(self, seconds):
+        with self._lock:
+            self.queue_wait.observe(seconds)
+
+    def observe_join(self):
+        """A caller attached to an in-flight transfer instead of starting its own."""
+        with self._lock:
+            self.joins += 1
+
+    def cache_hit(self, kind):
+        """A download (or lookup) served without the network: existing, manifest, store, search, civitai_metadata."""
+        with self._lock:
+            self.cache_hits[kind] += 1
+
+    def recent_downloads(self):
+        with self._lock:
+            return list(self.recent)
+
+    def totals(self):
+        with self._lock:
+            return {
+                "downloads": dict(self.downloads),
+                "bytes": sum(self.bytes_by_host.values()),
+                "retries": self.retries,
+                "shared_transfers": self.joins,
+                "cache_hits": dict(self.cache_hits),
+                "uptime": time.time() - self.started_at,
+            }
+
+    def render(self, active=0, queued=0):
+        """Prometheus text exposition; active/queued are the scheduler's current gauges."""
+        p = self.prefix
+        lines = []
+        with self._lock:
+            lines += [f"# HELP {p}_downloads_total Finished downloads by outcome.",
+                      f"# TYPE {p}_downloads_total counter"]
+            for status in sorted(set(self.downloads) | {'completed', 'failed', 'cancelled'}):
+                lines.append(f'{p}_downloads_total{{status="{status}"}} {self.downloads[status]}')
+
+            lines += [f"# HELP {p}_bytes_total Bytes received, by host.",
+                      f"# TYPE {p}_bytes_total counter"]
+            for host, nbytes in sorted(self.bytes_by_host.items()):
+                lines.append(f'{p}_bytes_total{{host="{_escape(host)}"}} {nbytes}')
+
+            lines += [f"# HELP {p}_retries_total Download restarts and reconnects.",
+                      f"# TYPE {p}_retries_total counter",
+                      f"{p}_retries_total {self.retries}",
+                      f"# HELP {p}_shared_transfers_total Requests that joined an in-flight download.",
+                      f"# TYPE {p}_shared_transfers_total counter",
+                      f"{p}_shared_transfers_total {self.joins}"]
+
+            lines += [f"# HELP {p}_cache_hits_total Requests served without downloading, by cache.",
+                      f"# TYPE {p}_cache_hits_total counter"]
+            for kind, count in sorted(self.cache_hits.items()):
+                lines.append(f'{p}_cache_hits_total{{cache="{kind}"}} {count}')
+
+            for name, histogram, help_text in (
+                    ("download_duration_seconds", self.duration, "Wall time per download."),
+                    ("time_to_first_byte_seconds", self.ttfb, "Time until response headers arrived."),
+                    ("download_throughput_bytes_per_second", self.throughput, "Average speed of completed downloads."),
+                    ("queue_wait_seconds", self.queue_wait, "Time jobs spent queued in the scheduler.")):
+                lines += [f"# HELP {p}_{name} {help_text}", f"# TYPE {p}_{name} histogram"]
+                histogram.render(f"{p}_{name}", lines)
+
+        lines += [f"# HELP {p}_active_downloads Downloads currently running.",
+                  f"# TYPE {p}_active_downloads gauge",
+                  f"{p}_active_downloads {active}",
+                  f"# HELP {p}_queued_downloads Downloads waiting in the scheduler queue.",
+                  f"# TYPE {p}_queued_downloads gauge",
+                  f"{p}_queued_downloads {queued}"]
+        return "\n".join(lines) + "\n"
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+download_metrics = DownloadMetrics()
@@ -0,0 +1,232 @@
+import email.utils
+import http.client
+import random
+import socket
+import threading
+import time
+import requests
+import urllib3
+
+class RetryableHTTPError(Exception):
+    """An HTTP status worth retrying (429, 5xx), with the server's Retry-After if it sent one."""
+
+    def __init__(self, status, retry_after=None):
+        super().__init__(f"HTTP {status}" + (f" (retry after {retry_after:.0f}s)" if retry_after else ""))
+        self.status = status
+        self.retry_after = retry_after
+
+class DownloadStalled(Exception):
+    pass
+
+class IncompleteDownload(Exception):
+    """The server closed the body before sending all of it."""
+
+class CircuitOpen(Exception):
+    pass
+
+def is_retryable_status(status):
+    return status in (408, 425, 429) or (500 <= status < 600 and status not in (501, 505))
+
+def parse_retry_after(value):
+    """Retry-After as seconds from now; it may be a number of seconds or an HTTP date."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+def check_response(response):
+    """raise_for_status(), but with retryable statuses raised as RetryableHTTPError."""
+    if is_retryable_status(response.status_code):
+        raise RetryableHTTPError(response.status_code, parse_retry_after(response.headers.get('retry-after')))
+    response.raise_for_status()
+
+# Transport failures that a new connection may fix
+_RETRYABLE_ERRORS = (
+    requests.ConnectionError,
+    requests.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+    urllib3.exceptions.ProtocolError,
+    urllib3.exceptions.ReadTimeoutError,
+    http.client.IncompleteRead,
+    http.client.RemoteDisconnected,
+    ConnectionError,
+    socket.timeout,
+    TimeoutError,
+    DownloadStalled,
+    IncompleteDownload,
+)
+
+def classify(error):
+    """Returns (retryable, retry_after seconds or None) for an exception from a download attempt."""
+    if isinstance(error, RetryableHTTPError):
+        return True, error.retry_after
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        return is_retryable_status(status), parse_retry_after(error.response.headers.get('retry-after'))
+    return isinstance(error, _RETRYABLE_ERRORS), None
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, never shorter than a server's Retry-After."""
+
+    def __init__(self, max_attempts=5, base_delay=1.0, max_delay=60.0, max_retry_after=300.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+
+    def delay(self, attempt, retry_after=None):
+        """Seconds to wait before retry number `attempt` (0-based)."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if retry_after:
+            delay = max(delay, min(retry_after, self.max_retry_after))
+        return delay
+
+    def configure(self, max_attempts=None, base_delay=None, max_delay=None):
+        if max_attempts is not None:
+            self.max_attempts = max(1, int(max_attempts))
+        if base_delay is not None:
+            self.base_delay = max(0.0, float(base_delay))
+        if max_delay is not None:
+            self.max_delay = max(0.0, float(max_delay))
+
+    def settings(self):
+        return {"max_attempts": self.max_attempts, "base_delay": self.base_delay, "max_delay": self.max_delay}
+
+class HostCircuitBreaker:
+    """
+    Per-host circuit breaker. After `failure_threshold` consecutive retryable
+    failures a host is open for `reset_timeout` seconds: new downloads from it fail
+    right away and running ones wait out the cooldown instead of hammering it.
+    The first attempt after the cooldown is a probe; success closes the circuit,
+    failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = {}
+        self._opened_at = {}
+        self._lock = threading.Lock()
+
+    def record_success(self, host):
+        with self._lock:
+            self._failures.pop(host, None)
+            self._opened_at.pop(host, None)
+
+    def record_failure(self, host):
+        with self._lock:
+            failures = self._failures.get(host, 0) + 1
+            self._failures[host] = failures
+            if failures >= self.failure_threshold:
+                if host not in self._opened_at:
+                    print(f"[Retry] Too many failures from {host}, pausing it for {self.reset_timeout:.0f}s")
+                self._opened_at[host] = time.monotonic()
+
+    def wait_time(self, host):
+        """Seconds until host may be tried again (0 if the circuit is closed or half-open)."""
+        with self._lock:
+            opened_at = self._opened_at.get(host)
+            if opened_at is None:
+                return 0.0
+            return max(opened_at + self.reset_timeout - time.monotonic(), 0.0)
+
+    def state(self):
+        now = time.monotonic()
+        with self._lock:
+            return {
+                host: {
+                    "failures": self._failures.get(host, 0),
+                    "open_for": max(opened_at + self.reset_timeout - now, 0.0),
+                }
+                for host, opened_at in self._opened_at.items()
+            }
+
+class _Watch:
+    __slots__ = ('sock', 'bytes', 'read_time', 'read_since', 'stalled')
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.bytes = 0
+        self.read_time = 0.0
+        self.read_since = None
+        self.stalled = False
+
+    def begin_read(self):
+        self.read_since = time.monotonic()
+
+    def end_read(self, count):
+        self.bytes += count
+        if self.read_since is not None:
+            self.read_time += time.monotonic() - self.read_since
+            self.read_since = None
+
+class StallWatchdog:
+    """
+    Detects connections that are open but too slow: less than `min_speed` bytes/s
+    over `timeout` seconds of time spent waiting on the socket (time spent in
+    bandwidth throttling or disk writes does not count). A stalled connection's
+    socket is shut down, which unblocks the reader so it can reconnect.
+    One background thread checks every watched connection once a second.
+    """
+
+    def __init__(self, min_speed=16 * 1024, timeout=30.0, interval=1.0):
+        self.min_speed = min_speed
+        self.timeout = timeout
+        self.interval = interval
+        self._watches = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def watch(self, response):
+        """Start watching a streaming requests response; call unwatch() when done."""
+        watch = _Watch(_response_socket(response))
+        with self._lock:
+            self._watches.add(watch)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        return watch
+
+    def unwatch(self, watch):
+        with self._lock:
+            self._watches.discard(watch)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            if not self.min_speed or not self.timeout:
+                continue
+            now = time.monotonic()
+            with self._lock:
+                watches = list(self._watches)
+            for watch in watches:
+                waited = watch.read_time + (now - watch.read_since if watch.read_since is not None else 0)
+                if waited < self.timeout:
+                    continue
+                if watch.bytes < self.min_speed * waited and watch.sock is not None and not watch.stalled:
+                    watch.stalled = True
+                    try:
+                        watch.sock.shutdown(socket.SHUT_RDWR)
+                    except OSError:
+                        pass
+                else:
+                    # Start a new measurement window
+                    watch.bytes = 0
+                    watch.read_time = 0.0
+                    if watch.read_since is not None:
+                        watch.read_since = now
+
+def _response_socket(response):
+    """The socket under a requests streaming response, or None if it can't be reached."""
+    raw = getattr(response, 'raw', None)
+    connection = getattr(raw, '_connection', None)
+    sock = getattr(connection, 'sock', None)
+    if sock is None:
+        fp = getattr(getattr(getattr(raw, '_fp', None), 'fp', None), 'raw', None)
+        sock = getattr(fp, '_sock', None)
+    return sock
@@ -1,10 +1,21 @@
 import requests
 from tqdm import tqdm
+import asyncio
+import concurrent.futures
+import hashlib
+import heapq
+import json
 import os
 import re
 import shutil
 import threading
-from urllib.parse import unquote
+import time
+from urllib.parse import unquote, urlparse
+from .model_store import normalize_sha256
+from .download_metrics import download_metrics
+from .shared_cache import shared_cache
+from .download_retry import (CircuitOpen, DownloadStalled, HostCircuitBreaker, IncompleteDownload, RetryPolicy,
+                             StallWatchdog, check_response, classify)
 
 def get_civitai_model_id_and_version(url):
     """
@@ -77,9 +88,471 @@ def sanitize_filename(filename):
     
     return filename
 
+class _ProgressTracker:
+    """
+    Thread-safe byte counter that drives tqdm and the node progress callback.
+    The callback is throttled: it fires when DownloadManager.progress_interval
+    seconds have passed or progress moved by DownloadManager.progress_min_percent,
+    and always at 100%. Each call carries bytes, total, speed and ETA.
+    """
+
+    def __init__(self, total_size, pbar, progress_callback=None, initial=0):
+        self.total_size = total_size
+        self.downloaded = initial
+        self.pbar = pbar
+        self.progress_callback = progress_callback
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._initial = initial
+        self._last_emit_time = 0.0
+        self._last_emit_percent = None
+
+    def update(self, size):
+        with self._lock:
+            self.downloaded += size
+            # tqdm rate-limits its own redraws
+            self.pbar.update(size)
+            
+            if not self.progress_callback or self.total_size <= 0:
+                return
+            
+            now = time.monotonic()
+            progress = (self.downloaded / self.total_size) * 100.0
+            due = (
+                self._last_emit_percent is None
+                or self.downloaded >= self.total_size
+                or now - self._last_emit_time >= DownloadManager.progress_interval
+                or progress - self._last_emit_percent >= DownloadManager.progress_min_percent
+            )
+            if not due:
+                return
+            self._last_emit_time = now
+            self._last_emit_percent = progress
+            details = self.details(now)
+        
+        # Outside the lock so slow callbacks don't stall the other segment workers
+        self.progress_callback.set_progress(progress, details)
+
+    def details(self, now=None):
+        now = time.monotonic() if now is None else now
+        elapsed = max(now - self._started, 1e-6)
+        speed = (self.downloaded - self._initial) / elapsed
+        remaining = max(self.total_size - self.downloaded, 0)
+        return {
+            "downloaded": self.downloaded,
+            "total": self.total_size,
+            "speed": speed,
+            "eta": remaining / speed if speed > 0 else None,
+        }
+
+class _DownloadJournal:
+    """
+    Sidecar file recording which byte ranges of a partial download are on disk.
+    Stored next to the .tmp file so an interrupted download can be resumed.
+    """
+    SUFFIX = '.journal'
+
+    def __init__(self, path, url, validator, total_size, completed=None):
+        self.path = path
+        self.url = url
+        self.validator = validator
+        self.total_size = total_size
+        self.completed = completed or []
+        self._lock = threading.Lock()
+        self._last_save = 0.0
+
+    @staticmethod
+    def path_for(temp_path):
+        return temp_path + _DownloadJournal.SUFFIX
+
+    @staticmethod
+    def load(temp_path):
+        path = _DownloadJournal.path_for(temp_path)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            completed = [(int(start), int(end)) for start, end in data.get('completed', [])]
+            return _DownloadJournal(path, data.get('url'), data.get('validator'),
+                                    int(data.get('total_size', 0)), completed)
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def matches(self, url, validator, total_size):
+        return (self.url == url and self.validator is not None
+                and self.validator == validator and self.total_size == total_size)
+
+    def mark(self, start, end):
+        """Record the inclusive byte range start-end as written."""
+        with self._lock:
+            ranges = sorted(self.completed + [(start, end)])
+            merged = [ranges[0]]
+            for s, e in ranges[1:]:
+                last_s, last_e = merged[-1]
+                if s <= last_e + 1:
+                    merged[-1] = (last_s, max(last_e, e))
+                else:
+                    merged.append((s, e))
+            self.completed = merged
+
+    def completed_bytes(self):
+        with self._lock:
+            return sum(e - s + 1 for s, e in self.completed)
+
+    def missing_ranges(self):
+        with self._lock:
+            missing = []
+            position = 0
+            for s, e in self.completed:
+                if s > position:
+                    missing.append((position, s - 1))
+                position = max(position, e + 1)
+            if position < self.total_size:
+                missing.append((position, self.total_size - 1))
+            return missing
+
+    def save(self, force=False):
+        """Atomically write the journal; unforced saves are throttled to once per second."""
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_save < 1.0:
+                return
+            self._last_save = now
+            data = {
+                'url': self.url,
+                'validator': self.validator,
+                'total_size': self.total_size,
+                'completed': self.completed,
+            }
+        temp = self.path + '.new'
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(temp, self.path)
+
+    def discard(self):
+        for path in (self.path, self.path + '.new'):
+            if os.path.exists(path):
+                os.remove(path)
+
+class _StreamingHasher:
+    """
+    Incremental whole-file SHA256 for downloads whose chunks may arrive out of order.
+    Chunks at the current hash position are hashed as they are written. When a
+    parallel segment becomes next in line, the part of it already written is read
+    back once (still hot in the page cache) and it is then hashed live. finalize()
+    reads whatever is left, e.g. bytes kept from an earlier resumed attempt.
+    """
+
+    def __init__(self, temp_path):
+        self.temp_path = temp_path
+        self.position = 0
+        self.digest = hashlib.sha256()
+        self._lock = threading.Lock()
+
+    def feed(self, offset, data, segment_start=None, file=None):
+        with self._lock:
+            if offset > self.position and segment_start is not None and segment_start <= self.position:
+                # Catch up on this segment's own bytes written before it became next in line
+                if file is not None:
+                    file.flush()
+                self._hash_from_disk(offset)
+            if offset == self.position:
+                self.digest.update(data)
+                self.position += len(data)
+
+    def finalize(self, read_size=8 * 1024 * 1024):
+        with self._lock:
+            self._hash_from_disk(os.path.getsize(self.temp_path), read_size)
+            return self.digest.hexdigest()
+
+    def _hash_from_disk(self, end, read_size=8 * 1024 * 1024):
+        with open(self.temp_path, 'rb') as f:
+            f.seek(self.position)
+            while self.position < end:
+                data = f.read(min(read_size, end - self.position))
+                if not data:
+                    raise Exception(f"Unexpected end of file while hashing {self.temp_path}")
+                self.digest.update(data)
+                self.position += len(data)
+
+class _FileSink:
+    """
+    Unbuffered positional writes into a download's temp file: os.pwrite straight
+    from the read buffer, with no file object buffer in between. Each writer
+    (e.g. each segment worker) opens its own sink.
+
+    preallocate() reserves the final size with posix_fallocate where available, so
+    a multi-GB file is not fragmented and a full disk fails up front. With
+    DownloadManager.drop_page_cache, written data is synced and dropped from the
+    page cache every drop_interval bytes (posix_fadvise DONTNEED), so a big
+    download does not push the loaded models out of memory.
+    """
+
+    def __init__(self, path, truncate=False):
+        flags = os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0)
+        if truncate:
+            flags |= os.O_TRUNC
+        self.fd = os.open(path, flags, 0o644)
+        # Written range not yet dropped from the page cache
+        self._drop_start = None
+        self._drop_end = None
+
+    def preallocate(self, size):
+        current = os.fstat(self.fd).st_size
+        if size <= 0 or current == size:
+            return
+        if current > size:
+            # fallocate never shrinks; drop a stale tail first
+            os.ftruncate(self.fd, size)
+            return
+        if DownloadManager.preallocate and hasattr(os, 'posix_fallocate'):
+            try:
+                os.posix_fallocate(self.fd, 0, size)
+                return
+            except OSError:
+                pass  # Filesystem without fallocate support
+        os.ftruncate(self.fd, size)
+
+    def write(self, data, offset):
+        """Write all of data (bytes or memoryview) at offset."""
+        view = memoryview(data)
+        written = 0
+        while written < len(view):
+            if hasattr(os, 'pwrite'):
+                written += os.pwrite(self.fd, view[written:], offset + written)
+            else:
+                # No pwrite on Windows; safe because every writer has its own descriptor
+                os.lseek(self.fd, offset + written, os.SEEK_SET)
+                written += os.write(self.fd, view[written:])
+        
+        if DownloadManager.drop_page_cache:
+            if self._drop_start is None:
+                self._drop_start = offset
+            self._drop_end = offset + written
+            if self._drop_end - self._drop_start >= DownloadManager.drop_interval:
+                self._drop()
+        return written
+
+    def _drop(self):
+        if self._drop_start is None or not hasattr(os, 'posix_fadvise'):
+            return
+        # Dirty pages can't be dropped; write them back first
+        os.fdatasync(self.fd)
+        os.posix_fadvise(self.fd, self._drop_start, self._drop_end - self._drop_start, os.POSIX_FADV_DONTNEED)
+        self._drop_start = self._drop_end = None
+
+    def close(self):
+        try:
+            if DownloadManager.drop_page_cache:
+                self._drop()
+        finally:
+            os.close(self.fd)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _body_reader(response):
+    """
+    A readinto() for the response body. For plain (unencoded) bodies this is the
+    underlying http.client response, which receives straight into the caller's
+    buffer; otherwise urllib3 decodes and copies.
+    """
+    raw = response.raw
+    encoding = response.headers.get('content-encoding', 'identity').lower()
+    fp = getattr(raw, '_fp', None)
+    if encoding == 'identity' and fp is not None and hasattr(fp, 'readinto'):
+        return fp.readinto
+    raw.decode_content = True
+    return raw.readinto
+
+def _read_full(readinto, view, watch=None, piece_size=256 * 1024):
+    """
+    Read until view is full or the body ends; returns the number of bytes read.
+    Reads in pieces so the stall watchdog sees progress within a large buffer.
+    """
+    filled = 0
+    while filled < len(view):
+        if watch is not None:
+            watch.begin_read()
+        count = 0
+        try:
+            count = readinto(view[filled:filled + piece_size])
+        except Exception as e:
+            if watch is not None and watch.stalled:
+                raise DownloadStalled("Connection stalled, reconnecting") from e
+            raise
+        finally:
+            if watch is not None:
+                watch.end_read(count or 0)
+        if not count:
+            if watch is not None and watch.stalled:
+                raise DownloadStalled("Connection stalled, reconnecting")
+            break
+        filled += count
+    return filled
+
+class BandwidthLimiter:
+    """
+    Token-bucket bandwidth limits shared by all downloads: a global cap plus
+    optional per-host and per-download caps, in bytes per second (0 = unlimited).
+
+    Under the global cap, bandwidth is handed out round robin per download, not per
+    connection, so a segmented download does not crowd out single-stream ones. A
+    download that is held back by its own host/download cap (or that simply
+    receives data slowly) does not take its turn, so the unused share goes to the
+    other active downloads instead of being split statically.
+    """
+    # Seconds of traffic a bucket may accumulate while idle
+    burst = 0.5
+
+    def __init__(self, global_limit=0, per_host_limit=0, per_download_limit=0):
+        self.global_limit = global_limit
+        self.per_host_limit = per_host_limit
+        self.per_download_limit = per_download_limit
+        self._cond = threading.Condition()
+        self._buckets = {}
+        # Downloads with a worker waiting for bandwidth, in round-robin order
+        self._waiting = {}
+
+    def configure(self, global_limit=None, per_host_limit=None, per_download_limit=None):
+        with self._cond:
+            if global_limit is not None:
+                self.global_limit = max(0, int(global_limit))
+            if per_host_limit is not None:
+                self.per_host_limit = max(0, int(per_host_limit))
+            if per_download_limit is not None:
+                self.per_download_limit = max(0, int(per_download_limit))
+            self._buckets.clear()
+            self._cond.notify_all()
+
+    def limits(self):
+        return {
+            "global_limit": self.global_limit,
+            "per_host_limit": self.per_host_limit,
+            "per_download_limit": self.per_download_limit,
+        }
+
+    def consume(self, download_key, host, nbytes, cancel_event=None):
+        """Block until nbytes may pass for this download. Returns early if cancel_event is set."""
+        if not (self.global_limit or self.per_host_limit or self.per_download_limit):
+            return
+        with self._cond:
+            self._enqueue(download_key, host)
+            try:
+                while not (cancel_event and cancel_event.is_set()):
+                    now = time.monotonic()
+                    buckets = self._buckets_for(download_key, host, now)
+                    if self._my_turn(download_key, nbytes, now) and all(self._ready(b, nbytes) for b in buckets):
+                        for bucket in buckets:
+                            bucket[0] -= nbytes
+                        return
+                    self._cond.wait(self._wait_time(buckets, nbytes))
+            finally:
+                # Leaving (served or cancelled) sends this download to the back of the line
+                self._dequeue(download_key)
+                self._cond.notify_all()
+
+    def _enqueue(self, download_key, host):
+        entry = self._waiting.get(download_key)
+        if entry is None:
+            self._waiting[download_key] = [1, host]
+        else:
+            entry[0] += 1
+
+    def _dequeue(self, download_key):
+        entry = self._waiting.pop(download_key, None)
+        if entry is not None and entry[0] > 1:
+            entry[0] -= 1
+            self._waiting[download_key] = entry
+
+    def _buckets_for(self, download_key, host, now):
+        buckets = []
+        for scope, rate in (('global', self.global_limit), (('host', host), self.per_host_limit),
+                            (('download', download_key), self.per_download_limit)):
+            if rate:
+                buckets.append(self._refill(scope, rate, now))
+        return buckets
+
+    def _refill(self, scope, rate, now):
+        # [tokens, last_refill, rate]
+        bucket = self._buckets.get(scope)
+        if bucket is None:
+            bucket = self._buckets[scope] = [rate * self.burst, now, rate]
+        bucket[0] = min(rate * self.burst, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        return bucket
+
+    def _ready(self, bucket, nbytes):
+        # Chunks larger than the burst size are allowed once the bucket is full, going into debt
+        return bucket[0] >= min(nbytes, bucket[2] * self.burst)
+
+    def _my_turn(self, download_key, nbytes, now):
+        """Under a global cap, the first waiting download not held back by its own caps goes next."""
+        if not self.global_limit:
+            return True
+        for key, (count, host) in self._waiting.items():
+            if key == download_key:
+                return True
+            own = [bucket for bucket in self._buckets_for(key, host, now) if bucket is not self._buckets['global']]
+            if all(self._ready(bucket, nbytes) for bucket in own):
+                return False
+        return True
+
+    def _wait_time(self, buckets, nbytes):
+        waits = [(min(nbytes, bucket[2] * self.burst) - bucket[0]) / bucket[2] for bucket in buckets]
+        return min(max(max(waits, default=0.0), 0.005), 0.1)
+
+class _Throttle:
+    """Binds one download to the shared limiter."""
+
+    def __init__(self, limiter, download_key, url):
+        self.limiter = limiter
+        self.download_key = download_key
+        self.host = urlparse(url).netloc.lower()
+
+    def consume(self, nbytes, cancel_event=None):
+        self.limiter.consume(self.download_key, self.host, nbytes, cancel_event)
+
+class _UpstreamChanged(Exception):
+    """Raised when an If-Range request returns the full body because the file changed."""
+
 class DownloadManager:
     active_downloads = {}
     _lock = threading.Lock()
+    
+    # Parallel range requests per download, and the smallest range worth its own connection
+    connections = 8
+    min_segment_size = 16 * 1024 * 1024
+    # How often (in bytes per connection) written data is flushed and recorded in the journal
+    journal_interval = 32 * 1024 * 1024
+    # progress_callback fires at most this often, unless progress moved by progress_min_percent
+    progress_interval = 0.5
+    progress_min_percent = 1.0
+    # Shared bandwidth caps, adjustable at runtime via /model_downloader/bandwidth
+    limiter = BandwidthLimiter()
+    # 'threads' runs each download on worker threads with requests; 'async' streams it
+    # with aiohttp on event_loop (see async_engine), keeping many transfers on one loop,
+    # but over a single connection and without resuming partial files
+    engine = 'threads'
+    event_loop = None
+    async_read_buffer = 4 * 1024 * 1024
+    # Reserve the full size of .tmp files up front (posix_fallocate where supported)
+    preallocate = True
+    # Drop downloaded data from the page cache every drop_interval bytes
+    drop_page_cache = os.environ.get('COMFYUI_EZ_DL_DROP_PAGE_CACHE', '').lower() in ('1', 'true', 'yes')
+    drop_interval = 64 * 1024 * 1024
+    # Timeouts for every request: (connect, read between bytes) in seconds
+    connect_timeout = 15
+    read_timeout = 60
+    # Retries for timeouts, resets, 429 and 5xx; a broken connection resumes with Range where possible
+    retry_policy = RetryPolicy()
+    circuit_breaker = HostCircuitBreaker()
+    # Connections slower than min_speed bytes/s for `timeout` seconds are dropped and reconnected
+    stall_watchdog = StallWatchdog()
+    # Disk quota / free-space guard run before a .tmp file is written (set by base_downloader)
+    cache_manager = None
 
     @staticmethod
     def cancel_download(node_id):
@@ -88,6 +561,11 @@ class DownloadManager:
         print(f"===== CANCEL ATTEMPT =====")
         print(f"Cancelling node_id: {node_id_str}")
         
+        # Scheduled downloads: the node is detached, and the transfer only stops
+        # if no other node is waiting on it
+        if download_scheduler.cancel(node_id_str):
+            return True
+        
         with DownloadManager._lock:
             print(f"Active downloads: {list(DownloadManager.active_downloads.keys())}")
             
@@ -100,20 +578,37 @@ class DownloadManager:
             return False
 
     @staticmethod
-    def download_with_progress(url, save_path, filename=None, progress_callback=None, params=None, chunk_size=1024*1024, node_id=None):
+    def download_with_progress(url, save_path, filename=None, progress_callback=None, params=None, chunk_size=1024*1024, node_id=None, connections=None, cancel_event=None, expected_sha256=None,
+                               shared_cache_dir=None, refresh_cache=False, reserve_connections=None):
         """
-        Download a file with progress tracking and cancel support.
+        Download a file with progress tracking, cancel and resume support.
         
         Args:
             url: Download URL
             save_path: Directory to save file
             filename: Optional filename (if not provided, extracted from response/URL)
-            progress_callback: Object with set_progress(percentage) method
+            progress_callback: Object with set_progress(percentage, details=None) method
             params: Query parameters for the request
             chunk_size: Download chunk size in bytes
             node_id: Node ID for cancel tracking
+            connections: Number of parallel range requests (defaults to DownloadManager.connections).
+                         Falls back to a single stream when the server does not support ranges.
+            cancel_event: Optional threading.Event to cancel with (the scheduler passes the job's event)
+            expected_sha256: Optional SHA256 the finished file must match; on a mismatch the
+                             .tmp file is deleted instead of being moved into place
+            shared_cache_dir: Optional shared cache directory (see shared_cache): the file is
+                              downloaded there under a cross-process lock, or taken from there
+                              if another process got it first, and linked into save_path
+            refresh_cache: Download again even if the shared cache already has the file
+            reserve_connections: Optional callable(wanted) -> granted the scheduler passes so a
+                                 job only holds the connections it actually opens
+        
+        If the download fails part way and the server supports ranges, the .tmp file
+        and its journal are kept so the next call for the same target only fetches
+        the missing bytes.
         """
-        cancel_event = threading.Event()
+        if cancel_event is None:
+            cancel_event = threading.Event()
         node_id_str = str(node_id) if node_id is not None else None
         
         if node_id_str:
@@ -124,10 +619,98 @@ class DownloadManager:
                 print(f"Registered cancel event for node_id: {node_id_str}")
                 print(f"Active downloads now: {list(DownloadManager.active_downloads.keys())}")
         
+        if connections is None:
+            connections = DownloadManager.connections
+        
+        # Filled in by _download for the metrics
+        stats = {'ttfb': None, 'bytes': 0, 'retries': 0}
+        started = time.monotonic()
+        status, error, result = 'failed', None, None
+        host = urlparse(url).netloc.lower()
+        try:
+            wait = DownloadManager.circuit_breaker.wait_time(host)
+            if wait > 0:
+                raise CircuitOpen(f"Too many recent failures from {host}; try again in {wait:.0f}s")
+            
+            def download(target_dir):
+                return DownloadManager._download_with_retries(url, target_dir, filename, progress_callback, params,
+                                                              chunk_size, connections, cancel_event, node_id_str,
+                                                              expected_sha256, stats, reserve_connections)
+            
+            if shared_cache_dir and filename:
+                result = shared_cache.fetch(shared_cache_dir, save_path, filename, download, cancel_event,
+                                            expected_sha256=expected_sha256, refresh=refresh_cache)
+            else:
+                result = download(save_path)
+            status = 'completed'
+            return result
+        except Exception as e:
+            status = 'cancelled' if cancel_event.is_set() else 'failed'
+            error = e
+            raise
+        finally:
+            download_metrics.observe_download(url, urlparse(url).netloc.lower(), status, stats['bytes'],
+                                              time.monotonic() - started, ttfb=stats['ttfb'],
+                                              retries=stats['retries'], error=error, path=result)
+            if node_id_str:
+                with DownloadManager._lock:
+                    if node_id_str in DownloadManager.active_downloads:
+                        del DownloadManager.active_downloads[node_id_str]
+                        print(f"Cleaned up cancel event for node: {node_id_str}")
+
+    @staticmethod
+    def _download_with_retries(url, save_path, filename, progress_callback, params, chunk_size, connections,
+                               cancel_event, node_id_str, expected_sha256, stats, reserve_connections=None):
+        """_download, retried with backoff on transient failures; each retry resumes the partial file."""
+        host = urlparse(url).netloc.lower()
+        attempt = 0
+        allow_resume = True
+        while True:
+            try:
+                result = DownloadManager._download(url, save_path, filename, progress_callback, params,
+                                                   chunk_size, connections, cancel_event, node_id_str,
+                                                   expected_sha256=expected_sha256, allow_resume=allow_resume,
+                                                   stats=stats, reserve_connections=reserve_connections)
+                DownloadManager.circuit_breaker.record_success(host)
+                return result
+            except _UpstreamChanged:
+                if not allow_resume:
+                    raise
+                print("Remote file changed since the partial download, restarting from scratch")
+                stats['retries'] += 1
+                allow_resume = False
+            except Exception as e:
+                retryable, retry_after = classify(e)
+                if not retryable or cancel_event.is_set():
+                    raise
+                DownloadManager.circuit_breaker.record_failure(host)
+                attempt += 1
+                if attempt >= DownloadManager.retry_policy.max_attempts:
+                    raise
+                delay = max(DownloadManager.retry_policy.delay(attempt - 1, retry_after),
+                            DownloadManager.circuit_breaker.wait_time(host))
+                print(f"Download attempt {attempt} failed ({str(e)}), retrying in {delay:.1f}s "
+                      f"({attempt + 1}/{DownloadManager.retry_policy.max_attempts})")
+                stats['retries'] += 1
+                if cancel_event.wait(delay):
+                    raise Exception("Download cancelled by user")
+
+    @staticmethod
+    def _download(url, save_path, filename, progress_callback, params, chunk_size, connections,
+                  cancel_event, node_id_str, expected_sha256=None, allow_resume=True, stats=None,
+                  reserve_connections=None):
         temp_path = None
+        full_path = None
+        journal = None
+        expected_sha256 = normalize_sha256(expected_sha256)
+        stats = stats if stats is not None else {}
         try:
-            response = requests.get(url, stream=True, params=params)
-            response.raise_for_status()
+            request_started = time.monotonic()
+            response = requests.get(url, stream=True, params=params,
+                                    timeout=(DownloadManager.connect_timeout, DownloadManager.read_timeout))
+            if stats.get('ttfb') is None:
+                stats['ttfb'] = time.monotonic() - request_started
+            check_response(response)
             
             total_size = int(response.headers.get('content-length', 0))
             
@@ -143,42 +726,310 @@ class DownloadManager:
             full_path = os.path.join(save_path, filename)
             temp_path = full_path + '.tmp'
             
-            downloaded = 0
-            with open(temp_path, 'wb') as file:
-                with tqdm(total=total_size, unit='iB', unit_scale=True, desc=filename) as pbar:
-                    for data in response.iter_content(chunk_size=chunk_size):
-                        # Check cancel event
-                        if node_id_str and cancel_event.is_set():
-                            print(f"===== DOWNLOAD CANCELLED =====")
-                            print(f"Node {node_id_str} download was cancelled")
-                            raise Exception("Download cancelled by user")
-
-                        size = file.write(data)
-                        downloaded += size
-                        pbar.update(size)
-                        pbar.refresh()
-                        
-                        if progress_callback and total_size > 0:
-                            progress = (downloaded / total_size) * 100.0
-                            progress_callback.set_progress(progress)
+            validator = DownloadManager._get_validator(response)
+            resumable = DownloadManager._supports_ranges(response, total_size) and validator is not None
+            
+            if resumable:
+                journal = _DownloadJournal.load(temp_path)
+                if (not allow_resume or journal is None or not journal.matches(url, validator, total_size)
+                        or not os.path.exists(temp_path) or os.path.getsize(temp_path) != total_size):
+                    if journal is not None:
+                        print(f"Discarding stale partial download: {temp_path}")
+                    journal = _DownloadJournal(_DownloadJournal.path_for(temp_path), url, validator, total_size)
+                    journal.discard()
+            else:
+                # Partial data from a previous attempt cannot be reused without ranges
+                stale = _DownloadJournal.load(temp_path)
+                if stale is not None:
+                    stale.discard()
+            
+            initial = journal.completed_bytes() if journal else 0
+            if initial:
+                print(f"Resuming download at {initial}/{total_size} bytes")
+            
+            if DownloadManager.cache_manager is not None:
+                # Make room (evicting unused models if needed) before anything is written
+                DownloadManager.cache_manager.ensure_space(save_path, full_path, total_size)
+            
+            with tqdm(total=total_size, initial=initial, unit='iB', unit_scale=True, desc=filename) as pbar:
+                progress = _ProgressTracker(total_size, pbar, progress_callback, initial=initial)
+                hasher = _StreamingHasher(temp_path) if expected_sha256 else None
+                throttle = _Throttle(DownloadManager.limiter, temp_path, response.url)
+                
+                try:
+                    segments = DownloadManager._split_ranges(journal.missing_ranges(), connections) if resumable else []
+                    if reserve_connections is not None:
+                        # Only now is it known how many connections this download will open
+                        granted = reserve_connections(max(len(segments), 1))
+                        if granted < len(segments):
+                            segments = DownloadManager._split_ranges(journal.missing_ranges(), granted)
+                
+                    if resumable and (initial or len(segments) > 1):
+                        # Ranges are fetched from the final (post-redirect) URL
+                        download_url = response.url
+                        response.close()
+                        if segments:
+                            print(f"Downloading {len(segments)} range(s) in parallel")
+                            DownloadManager._download_segmented(download_url, temp_path, total_size, segments,
+                                                                chunk_size, cancel_event, node_id_str, progress,
+                                                                journal=journal, if_range=validator, hasher=hasher,
+                                                                throttle=throttle, stats=stats)
+                    else:
+                        DownloadManager._download_single(response, temp_path, chunk_size, cancel_event, node_id_str,
+                                                         progress, journal=journal, hasher=hasher, throttle=throttle)
+                finally:
+                    stats['bytes'] = stats.get('bytes', 0) + progress.downloaded - initial
+            
+            if hasher:
+                # Only bytes that could not be hashed in order (e.g. from a previous run) are read back
+                actual_sha256 = hasher.finalize()
+                if actual_sha256 != expected_sha256:
+                    if journal:
+                        journal.discard()
+                    os.remove(temp_path)
+                    raise Exception(f"Hash mismatch for {filename}: expected {expected_sha256}, got {actual_sha256}")
+                print(f"Verified SHA256: {actual_sha256}")
             
             shutil.move(temp_path, full_path)
+            if journal:
+                journal.discard()
             print(f"===== DOWNLOAD COMPLETE =====")
             print(f"Successfully downloaded: {full_path}")
             return full_path
             
-        except Exception as e:
+        except _UpstreamChanged:
+            if journal:
+                journal.discard()
             if temp_path and os.path.exists(temp_path):
                 os.remove(temp_path)
-                print(f"Cleaned up temporary file: {temp_path}")
+            raise
+        except Exception as e:
+            keep_partial = (journal is not None and not cancel_event.is_set()
+                            and temp_path and os.path.exists(temp_path) and journal.completed_bytes() > 0)
+            if keep_partial:
+                journal.save(force=True)
+                print(f"Kept partial download for resume: {temp_path} "
+                      f"({journal.completed_bytes()}/{journal.total_size} bytes)")
+            else:
+                if journal:
+                    journal.discard()
+                if temp_path and os.path.exists(temp_path):
+                    os.remove(temp_path)
+                    print(f"Cleaned up temporary file: {temp_path}")
             print(f"Error occurred during download: {str(e)}")
             raise
         finally:
-            if node_id_str:
-                with DownloadManager._lock:
-                    if node_id_str in DownloadManager.active_downloads:
-                        del DownloadManager.active_downloads[node_id_str]
-                        print(f"Cleaned up cancel event for node: {node_id_str}")
+            if DownloadManager.cache_manager is not None and full_path:
+                DownloadManager.cache_manager.release(full_path)
+
+    @staticmethod
+    def _get_validator(response):
+        """Return a strong ETag or Last-Modified value usable with If-Range, or None."""
+        etag = response.headers.get('etag')
+        if etag and not etag.startswith('W/'):
+            return etag
+        return response.headers.get('last-modified')
+
+    @staticmethod
+    def _supports_ranges(response, total_size):
+        if total_size <= 0:
+            return False
+        if response.headers.get('accept-ranges', '').lower() != 'bytes':
+            return False
+        # Compressed transfers report the encoded length, which is useless for ranges
+        return response.headers.get('content-encoding', 'identity').lower() == 'identity'
+
+    @staticmethod
+    def _split_ranges(ranges, connections):
+        """
+        Split inclusive byte ranges so up to `connections` of them can be fetched in
+        parallel, never making a piece smaller than min_segment_size.
+        """
+        ranges = list(ranges)
+        connections = max(connections or 1, 1)
+        while len(ranges) < connections:
+            largest = max(ranges, key=lambda r: r[1] - r[0], default=None)
+            if largest is None:
+                break
+            start, end = largest
+            length = end - start + 1
+            if length < DownloadManager.min_segment_size * 2:
+                break
+            middle = start + length // 2
+            ranges.remove(largest)
+            ranges.extend([(start, middle - 1), (middle, end)])
+        return sorted(ranges)
+
+    @staticmethod
+    def _check_cancel(cancel_event, node_id_str):
+        # Scheduled downloads get no node_id here; the scheduler tracks their subscribers
+        if cancel_event.is_set():
+            print(f"===== DOWNLOAD CANCELLED =====")
+            print(f"Node {node_id_str or '(none)'} download was cancelled")
+            raise Exception("Download cancelled by user")
+
+    @staticmethod
+    def _download_single(response, temp_path, chunk_size, cancel_event, node_id_str, progress, journal=None, hasher=None,
+                         throttle=None):
+        """Stream the whole response body into temp_path over one connection."""
+        received = 0
+        # Bodies sent with a known, unencoded length can be preallocated and checked for truncation
+        expected = journal.total_size if journal else (
+            int(response.headers.get('content-length', 0))
+            if response.headers.get('content-encoding', 'identity').lower() == 'identity' else 0)
+        buffer = bytearray(chunk_size)
+        view = memoryview(buffer)
+        readinto = _body_reader(response)
+        watch = DownloadManager.stall_watchdog.watch(response)
+        try:
+            with _FileSink(temp_path, truncate=journal is None) as sink:
+                # Keeps the partial file at full size so a later resume can write at any offset
+                sink.preallocate(expected)
+                pending = 0
+                while True:
+                    size = _read_full(readinto, view, watch)
+                    if not size:
+                        break
+                    DownloadManager._check_cancel(cancel_event, node_id_str)
+                    data = view[:size]
+                    sink.write(data, received)
+                    if hasher:
+                        hasher.feed(received, data)
+                    received += size
+                    progress.update(size)
+                    if throttle:
+                        throttle.consume(size, cancel_event)
+                    
+                    pending += size
+                    if journal and pending >= DownloadManager.journal_interval:
+                        pending = 0
+                        journal.mark(0, received - 1)
+                        journal.save()
+        finally:
+            DownloadManager.stall_watchdog.unwatch(watch)
+            response.close()
+            if journal and received:
+                journal.mark(0, received - 1)
+        
+        if expected and received < expected:
+            raise IncompleteDownload(f"Download ended early ({received}/{expected} bytes)")
+
+    @staticmethod
+    def _download_segmented(url, temp_path, total_size, segments, chunk_size, cancel_event, node_id_str, progress,
+                            journal=None, if_range=None, hasher=None, throttle=None, stats=None):
+        """
+        Fetch byte ranges in parallel worker threads, each writing at its own
+        offset of a preallocated temp file. A worker whose connection breaks
+        reconnects from where it stopped, backing off per the retry policy.
+        """
+        with _FileSink(temp_path) as sink:
+            sink.preallocate(total_size)
+        
+        # Set by the first failing worker so the others stop early
+        abort_event = threading.Event()
+        errors = []
+        host = urlparse(url).netloc.lower()
+        policy = DownloadManager.retry_policy
+        breaker = DownloadManager.circuit_breaker
+        
+        def fetch(start, end, state):
+            """Fetch what is left of start..end, counting progress in state['received']."""
+            received = state['received']
+            headers = {'Range': f'bytes={start + received}-{end}'}
+            if if_range:
+                headers['If-Range'] = if_range
+            with requests.get(url, stream=True, headers=headers,
+                              timeout=(DownloadManager.connect_timeout, DownloadManager.read_timeout)) as response:
+                check_response(response)
+                if response.status_code != 206:
+                    if if_range and response.status_code == 200:
+                        raise _UpstreamChanged()
+                    raise Exception(f"Server ignored range request (status {response.status_code})")
+                
+                expected = end - start + 1
+                buffer = bytearray(chunk_size)
+                view = memoryview(buffer)
+                readinto = _body_reader(response)
+                watch = DownloadManager.stall_watchdog.watch(response)
+                try:
+                    with _FileSink(temp_path) as sink:
+                        pending = 0
+                        while received < expected:
+                            if abort_event.is_set():
+                                return
+                            # Never read past the requested range
+                            size = _read_full(readinto, view[:min(chunk_size, expected - received)], watch)
+                            if not size:
+                                break
+                            DownloadManager._check_cancel(cancel_event, node_id_str)
+                            data = view[:size]
+                            sink.write(data, start + received)
+                            if hasher:
+                                hasher.feed(start + received, data, segment_start=start)
+                            received += size
+                            state['received'] = received
+                            progress.update(size)
+                            if throttle:
+                                throttle.consume(size, cancel_event)
+                            
+                            pending += size
+                            if journal and pending >= DownloadManager.journal_interval:
+                                pending = 0
+                                journal.mark(start, start + received - 1)
+                                journal.save()
+                finally:
+                    DownloadManager.stall_watchdog.unwatch(watch)
+                    # The writes are unbuffered, so these bytes are in the file by now
+                    if journal and received:
+                        journal.mark(start, start + received - 1)
+                
+                if received < expected and not abort_event.is_set():
+                    raise IncompleteDownload(f"Segment {start}-{end} ended early ({received}/{expected} bytes)")
+        
+        def worker(start, end):
+            # Bytes from a broken connection are already on disk, so a reconnect starts after them
+            state = {'received': 0}
+            attempt = 0
+            try:
+                while True:
+                    try:
+                        fetch(start, end, state)
+                        breaker.record_success(host)
+                        return
+                    except Exception as e:
+                        retryable, retry_after = classify(e)
+                        if not retryable or abort_event.is_set() or cancel_event.is_set():
+                            raise
+                        breaker.record_failure(host)
+                        attempt += 1
+                        if attempt >= policy.max_attempts:
+                            raise
+                        delay = max(policy.delay(attempt - 1, retry_after), breaker.wait_time(host))
+                        print(f"Segment {start}-{end} interrupted at {state['received']}/{end - start + 1} bytes "
+                              f"({str(e)}), reconnecting in {delay:.1f}s")
+                        if stats is not None:
+                            stats['retries'] = stats.get('retries', 0) + 1
+                        if cancel_event.wait(delay) or abort_event.is_set():
+                            raise
+            except Exception as e:
+                errors.append(e)
+                abort_event.set()
+        
+        threads = [threading.Thread(target=worker, args=segment, daemon=True) for segment in segments]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        if errors:
+            # Prefer reporting a user cancel or an upstream change over secondary failures
+            for error in errors:
+                if isinstance(error, _UpstreamChanged):
+                    raise error
+            for error in errors:
+                if str(error) == "Download cancelled by user":
+                    raise error
+            raise errors[0]
 
     @staticmethod
     def _extract_filename(response, url):
@@ -216,4 +1067,392 @@ class DownloadManager:
             filename = "downloaded_file"
         
         print(f"Extracted filename from URL: {filename}")
-        return filename
\ No newline at end of file
+        return filename
+
+class _ProgressFanout:
+    """Forwards set_progress calls to every caller attached to a shared download."""
+
+    def __init__(self):
+        self.callbacks = []
+        self.last_progress = None
+        self.last_details = None
+        self._lock = threading.Lock()
+
+    def add(self, callback):
+        if callback is None:
+            return
+        with self._lock:
+            if callback in self.callbacks:
+                return
+            self.callbacks.append(callback)
+            last_progress = self.last_progress
+            last_details = self.last_details
+        # Late subscribers start from the current percentage instead of zero
+        if last_progress is not None:
+            callback.set_progress(last_progress, last_details)
+
+    def remove(self, callback):
+        with self._lock:
+            if callback in self.callbacks:
+                self.callbacks.remove(callback)
+
+    def set_progress(self, percentage, details=None):
+        with self._lock:
+            self.last_progress = percentage
+            self.last_details = details
+            callbacks = list(self.callbacks)
+        for callback in callbacks:
+            callback.set_progress(percentage, details)
+
+class DownloadJob:
+    """
+    A single scheduled download. Poll `status`/`to_dict()`, block on `wait()`,
+    or `await job` from async code.
+    A job may be shared by several callers requesting the same URL and destination.
+    Each node subscribed to it waits on a future of its own (wait(node_id=...)),
+    so cancelling one node only detaches that node; the transfer stops once no
+    subscriber is left.
+    """
+
+    def __init__(self, job_id, url, download_func, kwargs, priority=0):
+        self.job_id = job_id
+        self.url = url
+        self.host = urlparse(url).netloc.lower()
+        self.key = DownloadJob.make_key(url, kwargs.get('save_path'), kwargs.get('filename'))
+        self.download_func = download_func
+        self.progress = _ProgressFanout()
+        self.kwargs = dict(kwargs, progress_callback=self.progress)
+        self.priority = priority
+        self.node_id = str(kwargs['node_id']) if kwargs.get('node_id') is not None else None
+        self.subscribers = []
+        # Callers without a node_id can't cancel, so they keep the transfer going
+        self.anonymous = 0
+        self._waiters = {}
+        self._callbacks = {}
+        self.cancel_event = threading.Event()
+        self.future = concurrent.futures.Future()
+        self.subscribe(self.node_id, kwargs.get('progress_callback'))
+        self.status = 'queued'
+        self.connections = 0
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+
+    @staticmethod
+    def make_key(url, save_path, filename):
+        """Single-flight key: the resolved URL plus the destination path."""
+        destination = os.path.normcase(os.path.abspath(os.path.join(save_path or '', filename or '')))
+        return (url, destination)
+
+    def subscribe(self, node_id, progress_callback=None):
+        """Add a caller. Returns False if node_id was already subscribed."""
+        if node_id is None:
+            self.anonymous += 1
+        elif node_id in self.subscribers:
+            return False
+        else:
+            self.subscribers.append(node_id)
+            waiter = concurrent.futures.Future()
+            self._waiters[node_id] = waiter
+            self.future.add_done_callback(lambda future: self._settle(waiter, future))
+            if progress_callback is not None:
+                self._callbacks[node_id] = progress_callback
+        self.progress.add(progress_callback)
+        return True
+
+    def unsubscribe(self, node_id):
+        """
+        Detach node_id: its wait() raises a cancellation right away while the
+        download carries on for the others. Returns True if nobody is left.
+        """
+        self.subscribers.remove(node_id)
+        self.progress.remove(self._callbacks.pop(node_id, None))
+        # The waiter stays so a later wait(node_id=...) still sees the cancellation
+        self._settle(self._waiters[node_id], None)
+        return not self.subscribers and not self.anonymous
+
+    @staticmethod
+    def _settle(waiter, future):
+        """Copy the outcome of the shared future (None: cancelled) onto a subscriber's future."""
+        if waiter.done():
+            return
+        if future is None:
+            waiter.set_exception(Exception("Download cancelled by user"))
+        elif future.exception() is not None:
+            waiter.set_exception(future.exception())
+        else:
+            waiter.set_result(future.result())
+
+    def future_for(self, node_id=None):
+        """The future a caller waits on: the node's own, or the shared one."""
+        return self._waiters.get(str(node_id) if node_id is not None else None, self.future)
+
+    def wait(self, timeout=None, node_id=None):
+        """Block until the download finishes and return its result (re-raises failures)."""
+        return self.future_for(node_id).result(timeout)
+
+    def __await__(self):
+        return asyncio.wrap_future(self.future).__await__()
+
+    def done(self):
+        return self.future.done()
+
+    def to_dict(self):
+        return {
+            "job_id": self.job_id,
+            "node_id": self.node_id,
+            "subscribers": list(self.subscribers),
+            "url": self.url,
+            "priority": self.priority,
+            "status": self.status,
+            "connections": self.connections,
+            "progress": self.progress.last_progress,
+            "details": self.progress.last_details,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": str(self.error) if self.error else None,
+        }
+
+class DownloadScheduler:
+    """
+    Process-wide download queue with bounded concurrency.
+    Jobs are started in priority order (lower first), FIFO within a priority,
+    subject to max_concurrent running downloads and max_connections_per_host
+    HTTP connections per host. A job starts with one connection and takes more
+    (up to what the host has spare) once its range probe shows it can use them.
+    """
+
+    # Finished jobs kept around for polling
+    history_size = 100
+
+    def __init__(self, max_concurrent=3, max_connections_per_host=8):
+        self.max_concurrent = max_concurrent
+        self.max_connections_per_host = max_connections_per_host
+        self._queue = []
+        self._running = {}
+        self._jobs = {}
+        # Queued or running jobs by single-flight key
+        self._inflight = {}
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def configure(self, max_concurrent=None, max_connections_per_host=None, engine=None):
+        with self._lock:
+            if max_concurrent is not None:
+                self.max_concurrent = max(1, int(max_concurrent))
+            if max_connections_per_host is not None:
+                self.max_connections_per_host = max(1, int(max_connections_per_host))
+            if engine is not None:
+                if engine not in ('threads', 'async'):
+                    raise ValueError(f"Unknown download engine: {engine}")
+                if engine == 'async' and DownloadManager.engine != 'async':
+                    print("[Scheduler] Warning: the async engine uses one connection per download and does not "
+                          "resume partial files; a failed attempt is retried from the start")
+                DownloadManager.engine = engine
+        self._dispatch()
+
+    def submit(self, url, priority=0, download_func=None, **kwargs):
+        """
+        Queue a download and return its DownloadJob.
+        kwargs are passed to download_func (DownloadManager.download_with_progress by default).
+        """
+        if download_func is None:
+            download_func = DownloadManager.download_with_progress
+        key = DownloadJob.make_key(url, kwargs.get('save_path'), kwargs.get('filename'))
+        with self._lock:
+            existing = self._inflight.get(key)
+            if existing is not None:
+                self._attach(existing, kwargs, priority)
+                return existing
+            
+            self._counter += 1
+            job = DownloadJob(str(self._counter), url, download_func, dict(kwargs, url=url), priority)
+            self._jobs[job.job_id] = job
+            self._inflight[key] = job
+            heapq.heappush(self._queue, (priority, self._counter, job))
+            
+            # Register the cancel event right away so the cancel route can reach queued jobs
+            if job.node_id:
+                with DownloadManager._lock:
+                    DownloadManager.active_downloads.setdefault(job.node_id, job.cancel_event)
+            
+            print(f"[Scheduler] Queued job {job.job_id} ({job.host}), priority {priority}, "
+                  f"{len(self._queue)} queued, {len(self._running)} running")
+        self._dispatch()
+        return job
+
+    def _attach(self, job, kwargs, priority):
+        """Join a caller onto an in-flight job instead of starting a second transfer."""
+        node_id = str(kwargs['node_id']) if kwargs.get('node_id') is not None else None
+        if job.subscribe(node_id, kwargs.get('progress_callback')) and node_id:
+            with DownloadManager._lock:
+                DownloadManager.active_downloads.setdefault(node_id, job.cancel_event)
+        download_metrics.observe_join()
+        
+        # A more urgent caller pulls a queued job forward
+        if job.status == 'queued' and priority < job.priority:
+            job.priority = priority
+            self._queue = [(job.priority if entry[2] is job else entry[0], entry[1], entry[2])
+                           for entry in self._queue]
+            heapq.heapify(self._queue)
+        print(f"[Scheduler] Attached to in-flight job {job.job_id} for {job.key[1]} "
+              f"({len(job.subscribers)} subscriber(s))")
+
+    def cancel(self, node_id):
+        """
+        Detach node_id from its queued or running jobs. Returns True if it had any.
+        A shared job keeps going for its other subscribers; a job nobody is left
+        waiting for is dropped from the queue or, if running, stopped.
+        """
+        node_id_str = str(node_id)
+        detached, abandoned = [], []
+        with self._lock:
+            for job in list(self._inflight.values()):
+                if node_id_str in job.subscribers:
+                    detached.append(job)
+                    if job.unsubscribe(node_id_str):
+                        abandoned.append(job)
+            dropped = [job for job in abandoned if job.status == 'queued']
+            if dropped:
+                self._queue = [entry for entry in self._queue if entry[2] not in dropped]
+                heapq.heapify(self._queue)
+        
+        with DownloadManager._lock:
+            for job in detached:
+                if DownloadManager.active_downloads.get(node_id_str) is job.cancel_event:
+                    del DownloadManager.active_downloads[node_id_str]
+        for job in detached:
+            if job not in abandoned:
+                print(f"[Scheduler] Detached node {node_id_str} from job {job.job_id}; "
+                      f"{len(job.subscribers) + job.anonymous} subscriber(s) left")
+        for job in abandoned:
+            job.cancel_event.set()
+            if job in dropped:
+                print(f"[Scheduler] Removed queued job {job.job_id} for node {node_id_str}")
+                self._finish(job, error=Exception("Download cancelled by user"), status='cancelled')
+            else:
+                print(f"[Scheduler] Cancelling job {job.job_id} for node {node_id_str}")
+        return bool(detached)
+
+    def get_job(self, job_id):
+        with self._lock:
+            return self._jobs.get(str(job_id))
+
+    def jobs(self):
+        """Running, queued and recently finished jobs, in that order."""
+        with self._lock:
+            queued = [entry[2] for entry in sorted(self._queue)]
+            running = list(self._running.values())
+            finished = sorted((j for j in self._jobs.values() if j.finished_at is not None),
+                              key=lambda j: j.finished_at, reverse=True)
+        return [job.to_dict() for job in running + queued + finished]
+
+    def _host_connections(self, host):
+        return sum(job.connections for job in self._running.values() if job.host == host)
+
+    def _reserve_connections(self, job, wanted):
+        """Resize a running job's share of its host's connections. Returns how many it may open."""
+        with self._lock:
+            spare = self.max_connections_per_host - self._host_connections(job.host) + job.connections
+            job.connections = max(1, min(wanted, spare))
+            granted = job.connections
+        # Connections handed back may let a queued job start
+        self._dispatch()
+        return granted
+
+    def _dispatch(self):
+        """Start as many queued jobs as the concurrency limits allow."""
+        to_start = []
+        with self._lock:
+            deferred = []
+            while self._queue and len(self._running) < self.max_concurrent:
+                entry = heapq.heappop(self._queue)
+                job = entry[2]
+                available = self.max_connections_per_host - self._host_connections(job.host)
+                if available < 1:
+                    # Host is saturated; let jobs for other hosts go first
+                    deferred.append(entry)
+                    continue
+                job.connections = 1
+                job.status = 'running'
+                job.started_at = time.time()
+                download_metrics.observe_queue_wait(job.started_at - job.submitted_at)
+                self._running[job.job_id] = job
+                to_start.append(job)
+            for entry in deferred:
+                heapq.heappush(self._queue, entry)
+        
+        for job in to_start:
+            # Shared-cache jobs may block on another process's lock, which only a thread can do
+            if (job.download_func is DownloadManager.download_with_progress and DownloadManager.engine == 'async'
+                    and not job.kwargs.get('shared_cache_dir')):
+                self._run_async(job)
+            else:
+                threading.Thread(target=self._run, args=(job,), daemon=True).start()
+
+    def _run(self, job):
+        print(f"[Scheduler] Starting job {job.job_id}")
+        result, error = None, None
+        try:
+            kwargs = dict(job.kwargs)
+            if job.download_func is DownloadManager.download_with_progress:
+                kwargs['cancel_event'] = job.cancel_event
+                # Subscribers' cancel events are tracked by the scheduler, not per download
+                kwargs['node_id'] = None
+                kwargs['reserve_connections'] = lambda wanted: self._reserve_connections(job, wanted)
+            result = job.download_func(**kwargs)
+        except Exception as e:
+            error = e
+        self._complete(job, result, error)
+
+    def _run_async(self, job):
+        """Run the job as a coroutine on the download event loop instead of a thread."""
+        from .async_engine import download_async, get_event_loop
+        
+        print(f"[Scheduler] Starting job {job.job_id} on the async engine")
+        job.connections = 1
+        kwargs = dict(job.kwargs, cancel_event=job.cancel_event, node_id=None)
+        future = asyncio.run_coroutine_threadsafe(download_async(**kwargs), get_event_loop())
+        
+        def on_done(future):
+            try:
+                result, error = future.result(), None
+            except BaseException as e:
+                result, error = None, e
+            # Runs on the event loop; completion callbacks (model store ingest, manifest) may
+            # hash or copy multi-GB files, so they get a thread of their own
+            threading.Thread(target=self._complete, args=(job, result, error), daemon=True).start()
+        future.add_done_callback(on_done)
+
+    def _complete(self, job, result, error):
+        with self._lock:
+            self._running.pop(job.job_id, None)
+        if error is not None:
+            status = 'cancelled' if job.cancel_event.is_set() else 'failed'
+            self._finish(job, error=error, status=status)
+        else:
+            self._finish(job, result=result, status='completed')
+        self._dispatch()
+
+    def _finish(self, job, result=None, error=None, status='completed'):
+        job.status = status
+        job.finished_at = time.time()
+        job.error = error
+        with DownloadManager._lock:
+            for node_id in job.subscribers:
+                if DownloadManager.active_downloads.get(node_id) is job.cancel_event:
+                    del DownloadManager.active_downloads[node_id]
+        with self._lock:
+            if self._inflight.get(job.key) is job:
+                del self._inflight[job.key]
+            finished = [j for j in self._jobs.values() if j.finished_at is not None]
+            for old in sorted(finished, key=lambda j: j.finished_at)[:-self.history_size]:
+                del self._jobs[old.job_id]
+        if error is not None:
+            job.future.set_exception(error)
+        else:
+            job.future.set_result(result)
+
+download_scheduler = DownloadScheduler()
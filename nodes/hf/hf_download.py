@@ -1,6 +1,10 @@
-from ..base_downloader import BaseModelDownloader, get_model_dirs
+import os
+import threading
+from ..base_downloader import BaseModelDownloader, get_model_dirs, download_manifest
 from ..download_utils import DownloadManager
-from .hf_utils import parse_hf_url
+from ..bulk.bulk_download import bulk_runs
+from .hf_utils import (parse_hf_url, parse_hf_revision_url, parse_hf_repo_url, get_hf_file_metadata, get_hf_repo_commit,
+                       hf_resolve_url, hf_source, is_commit_sha, list_hf_repo_files, filter_repo_files)
 
 class HFDownloader(BaseModelDownloader):     
     @classmethod
@@ -14,6 +18,12 @@ class HFDownloader(BaseModelDownloader):
             "optional": {
                 "overwrite": ("BOOLEAN", {"default": True}),
                 "local_path_override": ("STRING", {"default": ""}),
+                "skip_if_current": ("BOOLEAN", {"default": True}),
+                "background": ("BOOLEAN", {"default": False}),
+                # Repo/folder URLs only: which files to fetch, and how many at once
+                "include_patterns": ("STRING", {"default": ""}),
+                "exclude_patterns": ("STRING", {"default": ""}),
+                "max_parallel": ("INT", {"default": 4, "min": 1, "max": 32}),
             },
             "hidden": {
                 "node_id": "UNIQUE_ID"
@@ -22,29 +32,102 @@ class HFDownloader(BaseModelDownloader):
         
     FUNCTION = "download"
 
-    def download(self, model_url, local_path, node_id, overwrite=False, local_path_override=""):
-        repo_id, filename = parse_hf_url(model_url)
+    def download(self, model_url, local_path, node_id, overwrite=False, local_path_override="", skip_if_current=True, background=False,
+                 include_patterns="", exclude_patterns="", max_parallel=4):
+        repo_id, revision, filename = parse_hf_revision_url(model_url)
+        final_path = local_path_override if local_path_override else local_path
+        
+        if not filename:
+            # A repo or folder URL: download a snapshot of it
+            repo_id, revision, folder = parse_hf_repo_url(model_url)
+            if repo_id:
+                return self.download_snapshot(repo_id, folder, final_path, node_id, include_patterns, exclude_patterns,
+                                              max_parallel, overwrite, skip_if_current, background, revision=revision)
         
         if not repo_id or not filename:
             print(f"Invalid Hugging Face URL: {model_url}")
             return {}
         
-        final_path = local_path_override if local_path_override else local_path
-        
-        print(f'downloading model {repo_id} {filename} {final_path} {node_id} {overwrite}')
+        print(f'downloading model {repo_id} {filename}@{revision} {final_path} {node_id} {overwrite}')
         self.node_id = node_id
         save_path = self.prepare_download_path(final_path, filename)
-        url = f"https://huggingface.co/{repo_id}/resolve/main/{filename}"
+        if self.keep_existing(os.path.join(save_path, filename), overwrite):
+            return {}
+        source = hf_source(repo_id, filename, revision)
+        # A commit SHA never changes, so a matching recorded download needs no network at all
+        if skip_if_current and self.find_current_download(source, save_path,
+                                                          revision=revision if is_commit_sha(revision) else None):
+            return {}
+        
+        # One HEAD request: the commit the revision points at now, and the SHA256 of LFS files
+        # (used to verify the download, to look up the model store and to tell if the local copy is current)
+        metadata = get_hf_file_metadata(repo_id, filename, revision)
+        if metadata is None:
+            entry = download_manifest.lookup(source, save_path)
+            if entry is not None and skip_if_current:
+                print(f"Could not reach the Hub, keeping the local copy: {entry['path']}")
+                return {}
+            metadata = {}
+        commit = metadata.get('commit')
+        expected_sha256 = metadata.get('sha256')
+        # Pinned to the commit so the bytes (and any resume) can't mix two versions if the branch moves
+        url = hf_resolve_url(repo_id, filename, commit or revision)
         
         return self.handle_download(
             DownloadManager.download_with_progress,
             save_path=save_path,
             filename=filename,
             overwrite=overwrite,
+            expected_sha256=expected_sha256,
+            source=source,
+            skip_if_current=skip_if_current,
+            background=background,
+            revision=commit,
+            etag=metadata.get('etag'),
             url=url,
             progress_callback=self
         )
     
+    def download_snapshot(self, repo_id, folder, final_path, node_id, include_patterns="", exclude_patterns="",
+                          max_parallel=4, overwrite=False, skip_if_current=True, background=False, revision="main"):
+        """
+        Download every file of a repo (or folder) matching the patterns, keeping the
+        repo's directory layout under final_path. Runs as a bulk download, so files
+        are fetched concurrently with one combined progress bar and present files are skipped.
+        """
+        self.node_id = node_id
+        # Every file comes from the same commit, even if the branch moves during the download
+        commit = get_hf_repo_commit(repo_id, revision) or revision
+        files = filter_repo_files(list_hf_repo_files(repo_id, folder, commit), include_patterns, exclude_patterns)
+        if not files:
+            print(f"No files in {repo_id}{'/' + folder if folder else ''} match the patterns")
+            return {}
+        
+        total = sum(f['size'] or 0 for f in files)
+        print(f"Snapshot of {repo_id}@{revision} ({commit[:12]}): {len(files)} files, "
+              f"{total / 1024 ** 3:.2f} GB into {final_path}")
+        entries = [{
+            "url": hf_resolve_url(repo_id, f['path'], commit),
+            "revision": commit,
+            "source": hf_source(repo_id, f['path'], revision),
+            "local_path": os.path.join(final_path, os.path.dirname(f['path'])),
+            "filename": os.path.basename(f['path']),
+            # From the tree listing, so no per-file metadata request is needed
+            "sha256": f['sha256'],
+            "etag": f['etag'],
+            "token": None,
+        } for f in files]
+        
+        run = bulk_runs.create(entries, node_id=node_id, max_parallel=max_parallel,
+                               overwrite=overwrite, skip_if_current=skip_if_current)
+        if background:
+            threading.Thread(target=run.run, daemon=True).start()
+            print(f"Downloading snapshot in the background (bulk run {run.run_id})")
+            return {}
+        run.run()
+        run.raise_for_failures()
+        return {}
+    
 
 
 class HFAuthDownloader(HFDownloader):  # Inherit from HFDownloader to share methods
@@ -2,47 +2,188 @@ import os
 from tqdm import tqdm
 import requests
 import re
+import fnmatch
+from urllib.parse import quote, unquote
+from ..model_store import normalize_sha256
 
-def parse_hf_url(url):
+# A revision is one path segment (branch, tag or commit, URL-encoded if it has
+# slashes), or an unencoded pull request / conversion ref
+_REVISION = r'(refs/(?:pr|convert)/[\w.-]+|[^/?#]+)'
+# user/repo: no '@' (it starts a revision in the shorthand) and no scheme or host
+_REPO_ID = r'([\w.-]+/[\w.-]+)'
+
+def _hub_path(url):
+    """The path of a huggingface.co URL, the shorthand itself, or None for any other host."""
+    match = re.match(r'(?:https?://)?(?:www\.)?huggingface\.co(?:/|$)', url)
+    if match:
+        return url[match.end():]
+    if re.match(r'https?://', url):
+        return None
+    return url
+
+def is_commit_sha(revision):
+    return bool(revision) and re.fullmatch(r'[0-9a-f]{40}', revision) is not None
+
+def quote_revision(revision):
+    """Revision as it goes in a URL path segment (refs/pr/1 -> refs%2Fpr%2F1)."""
+    return quote(revision, safe='')
+
+def parse_hf_revision_url(url):
     """
-    Parses a Hugging Face URL to extract the repo_id and filename.
-    Handles multiple formats:
+    Parses a Hugging Face file URL to extract the repo_id, revision and filename.
+    The revision may be a branch, a tag, a commit SHA or a refs/pr/N ref:
     - https://huggingface.co/user/repo/blob/main/file.safetensors
-    - https://huggingface.co/user/repo/resolve/main/file.safetensors
-    - user/repo/blob/main/file.safetensors (shorthand)
-    - user/repo/resolve/main/file.safetensors (shorthand)
-    - user/repo (just repo, returns None for filename)
+    - https://huggingface.co/user/repo/resolve/v1.0/file.safetensors
+    - https://huggingface.co/user/repo/resolve/<commit sha>/dir/file.safetensors
+    - user/repo/blob/refs%2Fpr%2F3/file.safetensors (shorthand)
+    - user/repo or user/repo@<revision> (just repo, returns None for the filename; see parse_hf_repo_url)
+    Raises ValueError for a blob/resolve URL that names a folder rather than a file.
     """
     # Remove whitespace
-    url = url.strip()
-    
-    # Try full URL format with domain
-    match = re.search(r'huggingface\.co/([^/]+/[^/]+)/(?:blob|resolve)/main/(.+)', url)
-    if match:
-        repo_id = match.group(1)
-        filename = match.group(2).split('?')[0]
-        return repo_id, filename
+    path = _hub_path(url.strip())
+    if path is None:
+        return None, None, None
     
-    # Try shorthand format: user/repo/blob/main/file.safetensors
-    match = re.search(r'^([^/]+/[^/]+)/(?:blob|resolve)/main/(.+)', url)
+    # Full URL with domain, or the same without it
+    match = re.match(_REPO_ID + r'/(?:blob|resolve)/' + _REVISION + r'/(.+)', path)
     if match:
         repo_id = match.group(1)
-        filename = match.group(2).split('?')[0]
-        return repo_id, filename
+        revision = unquote(match.group(2))
+        filename = unquote(match.group(3).split('?')[0].split('#')[0])
+        if not os.path.basename(filename):
+            raise ValueError(f"Hugging Face URL points to a folder, not a file: {url}")
+        return repo_id, revision, filename
     
-    # Try just repo format: user/repo
-    match = re.search(r'^([^/]+/[^/]+)$', url)
+    # Try just repo format: user/repo or user/repo@revision
+    match = re.fullmatch(_REPO_ID + r'(?:@([^/]+))?', path)
     if match:
         repo_id = match.group(1)
         # Return None for filename - caller should handle this
-        print(f"Warning: Only repo ID provided ({repo_id}), no specific file. Please specify a file.")
-        return repo_id, None
+        print(f"Only repo ID provided ({repo_id}), no specific file")
+        return repo_id, unquote(match.group(2) or "main"), None
     
-    # If nothing matches, return None, None
-    return None, None
+    # If nothing matches, return None, None, None
+    return None, None, None
+
+def parse_hf_url(url):
+    """
+    Parses a Hugging Face URL to extract the repo_id and filename, for callers that
+    don't care about the revision (see parse_hf_revision_url for the formats).
+    """
+    repo_id, revision, filename = parse_hf_revision_url(url)
+    return repo_id, filename
+
+def parse_hf_repo_url(url):
+    """
+    Parses a Hugging Face repository or folder URL to extract the repo_id, revision and folder.
+    Handles:
+    - https://huggingface.co/user/repo
+    - https://huggingface.co/user/repo/tree/v2.0/text_encoder
+    - user/repo, user/repo@<revision> and user/repo/tree/main/text_encoder (shorthand)
+    Returns (repo_id, revision, folder or None), or (None, None, None) for anything else (e.g. a file URL).
+    """
+    path = _hub_path(url.strip().split('?')[0].split('#')[0].rstrip('/'))
+    match = path is not None and re.fullmatch(_REPO_ID + r'(?:@([^/]+)|/tree/' + _REVISION + r'(?:/(.+))?)?', path)
+    if not match:
+        return None, None, None
+    revision = unquote(match.group(2) or match.group(3) or "main")
+    return match.group(1), revision, match.group(4)
+
+def list_hf_repo_files(repo_id, folder=None, revision="main"):
+    """
+    List every file in a model repo (or one folder of it, recursively) through the
+    Hub API. Returns dicts with the repo-relative path, size, the ETag the Hub
+    serves the file with (the SHA256 for LFS files, the git blob SHA1 otherwise)
+    and, for LFS files, SHA256.
+    """
+    url = f"https://huggingface.co/api/models/{repo_id}/tree/{quote_revision(revision)}" + (f"/{folder}" if folder else "")
+    params = {"recursive": "true"}
+    files = []
+    while url:
+        response = requests.get(url, params=params, timeout=30)
+        response.raise_for_status()
+        for item in response.json():
+            if item.get("type") != "file":
+                continue
+            lfs = item.get("lfs") or {}
+            files.append({
+                "path": item["path"],
+                "size": item.get("size") or lfs.get("size"),
+                "sha256": normalize_sha256(lfs.get("oid")),
+                "etag": lfs.get("oid") or item.get("oid"),
+            })
+        # Large repos are paginated through the Link header
+        url = response.links.get("next", {}).get("url")
+        params = None
+    return files
+
+def filter_repo_files(files, include_patterns="", exclude_patterns=""):
+    """
+    Keep files whose repo path matches any include glob (all files if none) and no
+    exclude glob. Patterns are separated by commas or newlines, e.g. "*.safetensors, *.json".
+    """
+    include = [p.strip() for p in re.split(r'[,\n]', include_patterns or "") if p.strip()]
+    exclude = [p.strip() for p in re.split(r'[,\n]', exclude_patterns or "") if p.strip()]
+    return [
+        f for f in files
+        if (not include or any(fnmatch.fnmatch(f["path"], p) for p in include))
+        and not any(fnmatch.fnmatch(f["path"], p) for p in exclude)
+    ]
+
+def hf_resolve_url(repo_id, filename, revision="main"):
+    return f"https://huggingface.co/{repo_id}/resolve/{quote_revision(revision)}/{filename}"
+
+def hf_source(repo_id, filename, revision="main"):
+    """Manifest source key; main keeps the plain form used before revisions were supported."""
+    if not revision or revision == "main":
+        return f"hf:{repo_id}/{filename}"
+    return f"hf:{repo_id}@{revision}/{filename}"
+
+def get_hf_repo_commit(repo_id, revision="main"):
+    """The commit SHA a branch or tag currently points to (one small API request)."""
+    if is_commit_sha(revision):
+        return revision
+    response = requests.get(f"https://huggingface.co/api/models/{repo_id}/revision/{quote_revision(revision)}",
+                            timeout=30)
+    response.raise_for_status()
+    return response.json().get("sha")
+
+def get_hf_file_metadata(repo_id, filename, revision="main"):
+    """
+    Metadata for one file at a revision from a single HEAD of its resolve URL
+    (redirects are not followed, so nothing is downloaded):
+    - commit: the commit SHA the revision resolved to (X-Repo-Commit)
+    - sha256: SHA256 of LFS files (X-Linked-Etag); small git files only have a git SHA1
+    - etag: the file's content ETag (the SHA256 for LFS files, the git SHA1 otherwise),
+      which tells whether a file without a SHA256 changed between commits
+    Returns None if the Hub could not be reached.
+    """
+    url = hf_resolve_url(repo_id, filename, revision)
+    try:
+        response = requests.head(url, allow_redirects=False, timeout=30)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        print(f"Could not fetch file metadata for {repo_id}/{filename}@{revision}: {str(e)}")
+        return None
+    headers = response.headers
+    etag = (headers.get('x-linked-etag') or headers.get('etag') or '').strip()
+    etag = etag[2:] if etag.startswith('W/') else etag
+    return {
+        "commit": headers.get('x-repo-commit'),
+        "sha256": normalize_sha256(headers.get('x-linked-etag')),
+        "etag": etag.strip('"') or None,
+    }
+
+def get_hf_file_sha256(repo_id, filename, revision="main"):
+    """
+    Return the SHA256 of an LFS file from the Hub's resolve headers, or None.
+    Only LFS files carry a SHA256 (X-Linked-Etag); small git files report a git SHA1.
+    """
+    metadata = get_hf_file_metadata(repo_id, filename, revision)
+    return metadata["sha256"] if metadata else None
 
-def download_hf(repo_id, filename, save_path, overwrite=False, progress_callback=None):
-    URL = f"https://huggingface.co/{repo_id}/resolve/main/{filename}"
+def download_hf(repo_id, filename, save_path, overwrite=False, progress_callback=None, revision="main"):
+    URL = hf_resolve_url(repo_id, filename, revision)
     
     # Get file size first
     response = requests.get(URL, stream=True)
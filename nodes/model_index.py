@@ -0,0 +1,168 @@
+import os
+import threading
+import time
+
+class _DirNode:
+    __slots__ = ('mtime', 'subdirs', 'files')
+
+    def __init__(self, mtime, subdirs, files):
+        self.mtime = mtime
+        self.subdirs = subdirs
+        # name -> (size, mtime)
+        self.files = files
+
+class ModelIndex:
+    """
+    Cached view of the models/ directory tree and the files in it.
+
+    Directories are listed once with os.scandir (reusing the dirent type instead of
+    an isdir() per entry) and re-listed only when their mtime changes, which happens
+    whenever an entry is added, removed or renamed in them. Revalidation is itself
+    rate limited, so repeated INPUT_TYPES calls cost at most one stat per directory
+    every `revalidate_interval` seconds; invalidate() lifts the limit once, after a
+    download put a new file in place.
+
+    Files are indexed by name as well, so existence checks do not depend on which
+    subfolder a model was guessed to live in.
+    """
+    revalidate_interval = 2.0
+    # How deep find()/exists() look for files
+    file_depth = 8
+
+    def __init__(self, root):
+        self.root = root
+        self._nodes = {}
+        # filename -> set of relative directories containing it
+        self._by_name = {}
+        self._validated_at = {}
+        self._lock = threading.RLock()
+
+    def get_dirs(self, max_depth=3):
+        """
+        All subdirectories up to max_depth levels deep, relative to the root
+        (e.g. 'loras', 'loras/SDXL'), sorted. Hidden directories are skipped.
+        """
+        with self._lock:
+            self._refresh(max_depth)
+            dirs = []
+            self._collect('', 0, max_depth, dirs)
+        return sorted(dirs)
+
+    def find(self, filename):
+        """
+        Every indexed copy of filename, as dicts with name, size, mtime,
+        relative dir and relative path, sorted by relative path.
+        """
+        with self._lock:
+            self._refresh(self.file_depth)
+            matches = []
+            for rel_dir in self._by_name.get(filename, ()):
+                size, mtime = self._nodes[rel_dir].files[filename]
+                matches.append({
+                    "name": filename,
+                    "size": size,
+                    "mtime": mtime,
+                    "dir": rel_dir,
+                    "path": os.path.join(rel_dir, filename) if rel_dir else filename,
+                })
+        return sorted(matches, key=lambda m: m["path"])
+
+    def exists(self, path):
+        """
+        True if a model matching path is anywhere under the root. A path with
+        subfolders (e.g. 'SDXL/model.safetensors', as loaders report it) must match
+        the trailing components of the file's location.
+        """
+        path = path.replace('\\', '/').strip('/')
+        filename = path.rsplit('/', 1)[-1]
+        for match in self.find(filename):
+            if ('/' + match["path"].replace(os.sep, '/')).endswith('/' + path):
+                return True
+        return False
+
+    def invalidate(self):
+        """Revalidate on the next lookup; only directories whose mtime changed are re-listed."""
+        with self._lock:
+            self._validated_at.clear()
+
+    def _refresh(self, max_depth):
+        now = time.monotonic()
+        if now - self._validated_at.get(max_depth, float('-inf')) < self.revalidate_interval:
+            return
+        self._sync('', 0, max_depth)
+        self._validated_at[max_depth] = now
+
+    def _abs(self, rel_path):
+        return os.path.join(self.root, rel_path) if rel_path else self.root
+
+    def _sync(self, rel_path, depth, max_depth):
+        abs_path = self._abs(rel_path)
+        try:
+            mtime = os.stat(abs_path).st_mtime_ns
+        except OSError:
+            self._drop(rel_path)
+            return
+
+        node = self._nodes.get(rel_path)
+        if node is None or node.mtime != mtime:
+            node = self._scan(rel_path, abs_path, mtime, node)
+
+        if depth < max_depth:
+            for name in node.subdirs:
+                self._sync(os.path.join(rel_path, name) if rel_path else name, depth + 1, max_depth)
+
+    def _scan(self, rel_path, abs_path, mtime, old_node):
+        subdirs = []
+        files = {}
+        try:
+            with os.scandir(abs_path) as entries:
+                for entry in entries:
+                    if entry.name.startswith('.'):
+                        continue
+                    try:
+                        if entry.is_dir():
+                            subdirs.append(entry.name)
+                        elif entry.is_file():
+                            stat = entry.stat()
+                            files[entry.name] = (stat.st_size, stat.st_mtime)
+                    except OSError:
+                        pass  # Skip entries we can't access
+        except (PermissionError, OSError):
+            pass  # Skip directories we can't access
+
+        # Forget subtrees that disappeared
+        if old_node is not None:
+            for name in set(old_node.subdirs) - set(subdirs):
+                self._drop(os.path.join(rel_path, name) if rel_path else name)
+            self._unindex_files(rel_path, old_node)
+
+        node = _DirNode(mtime, sorted(subdirs), files)
+        self._nodes[rel_path] = node
+        for name in files:
+            self._by_name.setdefault(name, set()).add(rel_path)
+        return node
+
+    def _drop(self, rel_path):
+        node = self._nodes.pop(rel_path, None)
+        if node is not None:
+            self._unindex_files(rel_path, node)
+            for name in node.subdirs:
+                self._drop(os.path.join(rel_path, name) if rel_path else name)
+
+    def _unindex_files(self, rel_path, node):
+        for name in node.files:
+            dirs = self._by_name.get(name)
+            if dirs is not None:
+                dirs.discard(rel_path)
+                if not dirs:
+                    del self._by_name[name]
+
+    def _collect(self, rel_path, depth, max_depth, out):
+        node = self._nodes.get(rel_path)
+        if node is None or depth > max_depth:
+            return
+        for name in node.subdirs:
+            child = os.path.join(rel_path, name) if rel_path else name
+            out.append(child)
+            if depth < max_depth:
+                self._collect(child, depth + 1, max_depth, out)
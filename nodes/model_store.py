@@ -0,0 +1,154 @@
+import hashlib
+import os
+import shutil
+import threading
+
+# Linux FICLONE ioctl, used for copy-on-write reflinks on btrfs/XFS
+FICLONE = 0x40049409
+
+def normalize_sha256(value):
+    """Return a lowercase hex SHA256 or None (accepts HF etags with quotes and CivitAI uppercase)."""
+    if not value:
+        return None
+    value = str(value).strip().strip('"').lower()
+    if value.startswith('sha256:'):
+        value = value[len('sha256:'):]
+    if len(value) != 64 or any(c not in '0123456789abcdef' for c in value):
+        return None
+    return value
+
+def sha256_file(path, chunk_size=8 * 1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                break
+            digest.update(data)
+    return digest.hexdigest()
+
+LINK_MODES = ('auto', 'hardlink', 'reflink', 'symlink', 'copy')
+
+def _link(mode, source, target):
+    if mode == 'hardlink':
+        os.link(source, target)
+    elif mode == 'reflink':
+        import fcntl
+        with open(source, 'rb') as src, open(target, 'wb') as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    elif mode == 'symlink':
+        os.symlink(os.path.abspath(source), target)
+    else:
+        shutil.copy2(source, target)
+
+def link_file(source, target_path, link_mode='auto'):
+    """
+    Atomically replace target_path with a hardlink, reflink, symlink or copy of
+    source (in that order for 'auto'). Returns the mode used, or None if all failed.
+    """
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    temp_path = target_path + '.link'
+    if os.path.lexists(temp_path):
+        os.remove(temp_path)
+
+    modes = ('hardlink', 'reflink', 'symlink', 'copy') if link_mode == 'auto' else (link_mode,)
+    for mode in modes:
+        try:
+            _link(mode, source, temp_path)
+        except (OSError, ImportError) as e:
+            print(f"[Link] {mode} failed for {target_path}: {str(e)}")
+            if os.path.lexists(temp_path):
+                os.remove(temp_path)
+            continue
+        os.replace(temp_path, target_path)
+        return mode
+    return None
+
+class ModelStore:
+    """
+    Optional content-addressed blob store keyed by SHA256.
+    Each model's bytes are kept once under <root>/sha256/<aa>/<hash> and every
+    requested save_path/filename is materialized as a hardlink, reflink,
+    symlink or (as a last resort) a copy of the blob.
+
+    Enabled by setting the COMFYUI_EZ_DL_STORE environment variable to the store
+    root. COMFYUI_EZ_DL_LINK_MODE picks the strategy: auto (default), hardlink,
+    reflink, symlink or copy.
+    """
+    LINK_MODES = LINK_MODES
+
+    def __init__(self, root=None, link_mode='auto'):
+        self.root = root
+        self.link_mode = link_mode if link_mode in self.LINK_MODES else 'auto'
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self.root)
+
+    def blob_path(self, sha256):
+        sha256 = normalize_sha256(sha256)
+        if not sha256:
+            return None
+        return os.path.join(self.root, 'sha256', sha256[:2], sha256)
+
+    def has(self, sha256):
+        path = self.blob_path(sha256) if self.enabled else None
+        return bool(path) and os.path.isfile(path)
+
+    def materialize(self, sha256, target_path):
+        """
+        Create target_path from the stored blob. Returns the link mode used,
+        or None when the blob is not in the store.
+        """
+        if not self.has(sha256):
+            return None
+        blob = self.blob_path(sha256)
+
+        # Already the same inode (or a symlink to the blob): nothing to do
+        if os.path.exists(target_path):
+            try:
+                if os.path.samefile(blob, target_path):
+                    return 'existing'
+            except OSError:
+                pass
+
+        mode = link_file(blob, target_path, self.link_mode)
+        if mode:
+            print(f"[ModelStore] Materialized {target_path} from store ({mode})")
+        return mode
+
+    def ingest(self, path, sha256=None, verified=False):
+        """
+        Add a downloaded file to the store and link it back in place.
+        If sha256 is given it is checked against the file contents, unless verified
+        says the download already did so; on a mismatch the file is left alone and
+        None is returned. Returns the file's hash.
+        """
+        if not self.enabled:
+            return None
+        expected = normalize_sha256(sha256)
+        actual = expected if verified and expected else sha256_file(path)
+        if expected and actual != expected:
+            print(f"[ModelStore] Hash mismatch for {path}: expected {expected}, got {actual}; not storing")
+            return None
+
+        blob = self.blob_path(actual)
+        with self._lock:
+            if not os.path.isfile(blob):
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                try:
+                    os.link(path, blob)
+                except OSError:
+                    # Store on another filesystem: keep a private copy
+                    shutil.copy2(path, blob + '.tmp')
+                    os.replace(blob + '.tmp', blob)
+                print(f"[ModelStore] Stored {path} as {actual}")
+
+        self.materialize(actual, path)
+        return actual
+
+model_store = ModelStore(
+    root=os.environ.get('COMFYUI_EZ_DL_STORE') or None,
+    link_mode=os.environ.get('COMFYUI_EZ_DL_LINK_MODE', 'auto'),
+)
@@ -0,0 +1,266 @@
+import os
+import socket
+import threading
+import time
+from .model_store import LINK_MODES, link_file, normalize_sha256, sha256_file
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# lockf does not exclude threads of one process, so each target also has a thread lock
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+def _thread_lock(path):
+    with _thread_locks_guard:
+        return _thread_locks.setdefault(os.path.normcase(os.path.abspath(path)), threading.Lock())
+
+class TargetLock:
+    """
+    Exclusive cross-process lock for one cache target, held with fcntl.lockf on
+    <target>.lock. The kernel drops the lock when its holder dies, so a crashed
+    download never blocks the others; the next holder resumes from its partial file.
+
+    For holders that are alive but stuck (or on a host that vanished from a
+    network filesystem), the lock file's mtime is a heartbeat refreshed every
+    `heartbeat` seconds. A lock not refreshed for `stale_timeout` seconds is
+    broken by unlinking the file, and waiters lock a fresh one.
+
+    POSIX record locks belong to the process and are dropped when it closes any
+    descriptor for the file, so the holder never opens the lock file a second time,
+    and threads of the same process queue on a per-target threading.Lock first.
+    """
+    poll_interval = 1.0
+
+    def __init__(self, path, heartbeat=30.0, stale_timeout=300.0):
+        self.path = path
+        self.heartbeat = heartbeat
+        self.stale_timeout = stale_timeout
+        self._file = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._local = _thread_lock(path)
+
+    def acquire(self, cancel_event=None):
+        while not self._local.acquire(timeout=self.poll_interval):
+            if cancel_event is not None and cancel_event.is_set():
+                raise Exception("Download cancelled by user")
+        try:
+            return self._acquire_file(cancel_event)
+        except BaseException:
+            self._local.release()
+            raise
+
+    def _acquire_file(self, cancel_event):
+        waiting_since = None
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                raise Exception("Download cancelled by user")
+            f = open(self.path, 'a+')
+            try:
+                fcntl.lockf(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                f.close()
+                if waiting_since is None:
+                    waiting_since = time.time()
+                    print(f"[SharedCache] Waiting for {self._holder() or 'another process'} to finish "
+                          f"{os.path.basename(self.path[:-len('.lock')])}")
+                self._break_if_stale()
+                time.sleep(self.poll_interval)
+                continue
+
+            # The file may have been unlinked (released or broken) between open and lock
+            try:
+                current = os.stat(self.path)
+            except FileNotFoundError:
+                current = None
+            if current is None or current.st_ino != os.fstat(f.fileno()).st_ino:
+                f.close()
+                continue
+
+            f.seek(0)
+            f.truncate()
+            f.write(f"{socket.gethostname()} pid {os.getpid()}\n")
+            f.flush()
+            self._file = f
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._beat, daemon=True)
+            self._thread.start()
+            if waiting_since is not None:
+                print(f"[SharedCache] Got lock after {time.time() - waiting_since:.0f}s: {self.path}")
+            return self
+
+    def release(self):
+        if self._file is None:
+            return
+        self._stop.set()
+        try:
+            # Unlink while still holding the lock so waiters re-check the inode, but only
+            # our own file: if the lock was broken as stale, the path is the next holder's
+            if os.stat(self.path).st_ino == os.fstat(self._file.fileno()).st_ino:
+                os.remove(self.path)
+        except OSError:
+            pass
+        self._file.close()
+        self._file = None
+        self._local.release()
+
+    def _beat(self):
+        while not self._stop.wait(self.heartbeat):
+            try:
+                os.utime(self.path)
+            except OSError:
+                pass
+
+    def _holder(self):
+        try:
+            with open(self.path) as f:
+                return f.read().strip()
+        except OSError:
+            return None
+
+    def _break_if_stale(self):
+        try:
+            age = time.time() - os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return
+        if age > self.stale_timeout:
+            print(f"[SharedCache] Breaking stale lock ({self._holder() or 'unknown holder'}, "
+                  f"no heartbeat for {age:.0f}s): {self.path}")
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+
+class SharedCache:
+    """
+    Model cache shared by several ComfyUI installs on one host. Files are
+    downloaded once into <root>/<path relative to models/> by whichever process
+    gets there first, while the others wait on that target's lock, and every
+    install then links the cached file into its own models/ tree.
+
+    Enabled by setting COMFYUI_EZ_DL_SHARED_CACHE to the cache root (needs fcntl,
+    so POSIX only). Linking follows COMFYUI_EZ_DL_LINK_MODE like the model store.
+    """
+
+    def __init__(self, root=None, link_mode='auto', heartbeat=30.0, stale_timeout=300.0):
+        if root and fcntl is None:
+            print("[SharedCache] File locking is not available on this platform; shared cache disabled")
+            root = None
+        self.root = root
+        self.link_mode = link_mode if link_mode in LINK_MODES else 'auto'
+        self.heartbeat = heartbeat
+        self.stale_timeout = stale_timeout
+
+    @property
+    def enabled(self):
+        return bool(self.root)
+
+    def dir_for(self, save_path, models_dir):
+        """The cache directory mirroring save_path, or None if save_path is not under models_dir."""
+        if not self.enabled:
+            return None
+        relative = os.path.relpath(os.path.abspath(save_path), os.path.abspath(models_dir))
+        if relative == os.pardir or relative.startswith(os.pardir + os.sep) or os.path.isabs(relative):
+            return None
+        return os.path.normpath(os.path.join(self.root, relative))
+
+    def lock(self, cached_path):
+        return TargetLock(cached_path + '.lock', heartbeat=self.heartbeat, stale_timeout=self.stale_timeout)
+
+    def materialize(self, cache_dir, save_path, filename, expected_sha256=None):
+        """Link a finished cached file into save_path. Returns the local path, or None on a miss."""
+        cached = os.path.join(cache_dir, filename)
+        if not self._usable(cached, expected_sha256):
+            return None
+        target = os.path.join(save_path, filename)
+        if os.path.exists(target):
+            try:
+                if os.path.samefile(cached, target):
+                    return target
+            except OSError:
+                pass
+        mode = link_file(cached, target, self.link_mode)
+        if not mode:
+            return None
+        print(f"[SharedCache] Linked {target} from shared cache ({mode})")
+        return target
+
+    def fetch(self, cache_dir, save_path, filename, download, cancel_event=None, expected_sha256=None,
+              refresh=False):
+        """
+        Make sure cache_dir/filename exists, calling download(cache_dir) under the
+        target's lock unless another process already fetched it, then link it into
+        save_path. With refresh, a cached copy is only reused if it was written
+        while we waited for the lock. Returns the local path.
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        cached = os.path.join(cache_dir, filename)
+        requested_at = time.time()
+        lock = self.lock(cached).acquire(cancel_event)
+        try:
+            fresh = os.path.isfile(cached) and os.path.getmtime(cached) >= requested_at
+            if fresh or (not refresh and self._usable(cached, expected_sha256)):
+                print(f"[SharedCache] {filename} was downloaded by another process")
+            else:
+                cached = download(cache_dir)
+                if normalize_sha256(expected_sha256):
+                    # Verified while streaming; saves the next reader from hashing it
+                    self._write_sha256(cached, expected_sha256)
+                else:
+                    self._remove_sha256(cached)
+        finally:
+            lock.release()
+
+        target = os.path.join(save_path, filename)
+        if not link_file(cached, target, self.link_mode):
+            raise Exception(f"Could not link {cached} into {save_path}")
+        return target
+
+    def _usable(self, cached, expected_sha256):
+        if not os.path.isfile(cached):
+            return False
+        expected = normalize_sha256(expected_sha256)
+        if not expected:
+            return True
+        recorded = self._read_sha256(cached)
+        if recorded is None:
+            recorded = sha256_file(cached)
+            self._write_sha256(cached, recorded)
+        return recorded == expected
+
+    @staticmethod
+    def _read_sha256(cached):
+        try:
+            with open(cached + '.sha256') as f:
+                value, mtime = f.read().split()
+            # Only trust it for the file it was written for
+            return value if float(mtime) == os.path.getmtime(cached) else None
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_sha256(cached, sha256):
+        with open(cached + '.sha256.tmp', 'w') as f:
+            f.write(f"{normalize_sha256(sha256)} {os.path.getmtime(cached)!r}\n")
+        os.replace(cached + '.sha256.tmp', cached + '.sha256')
+
+    @staticmethod
+    def _remove_sha256(cached):
+        try:
+            os.remove(cached + '.sha256')
+        except OSError:
+            pass
+
+shared_cache = SharedCache(
+    root=os.environ.get('COMFYUI_EZ_DL_SHARED_CACHE') or None,
+    link_mode=os.environ.get('COMFYUI_EZ_DL_LINK_MODE', 'auto'),
+)